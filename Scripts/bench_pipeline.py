@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+合成メニューによるパイプラインの規模ベンチマーク
+商品数の段階ごとに以下のステージを実行し、実時間とピークメモリ（tracemalloc）を表示する
+- format_data        : スクレイパーの _format_data（検証・カテゴリー別整形）
+- update_initial     : update_chains_menu（空のストアへの全シャード書き込み・統合JSON出力・差分パッチ）
+- update_incremental : update_chains_menu（約1%のチェーンが変更された週次更新相当）
+- load               : シャードからの読み込みと検証
+- export             : 統合 ChainsMenu.json の書き出し
+- delta_publish      : 履歴と差分パッチの再生成
+- import_plan        : ローカルの代替DB（SQLite）からのページング取得と商品照合によるインポート計画
+- checksum           : チェーン単位のチェックサム計算
+ファイルは一時ディレクトリに書き出し、リポジトリのデータには触れない
+時間には tracemalloc の計測負荷が含まれる（段階間・ステージ間の比較用）
+
+実行方法: python3 Scripts/bench_pipeline.py --chains 1000 --products 5000,20000,50000,100000
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from menu_checksum import chain_checksum
+from menu_delta import DeltaPublisher
+from menu_model import dumps
+from menu_store import MenuStore
+from import_planner import plan_chain_import
+from scrape_all_chains import CafeScraper, update_chains_menu
+from synthetic_menu import build_menu, generate_catalog, mutate_catalog
+
+
+class LocalMenuDB:
+    """
+    Supabase の chain_products / product_sizes を模した SQLite（メモリ上）
+    fetch_existing_products は import_chains_to_supabase.py と同じ形式・同じページングで返す
+    """
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript("""
+            CREATE TABLE chain_products (id INTEGER PRIMARY KEY, chain_id TEXT, name TEXT, category TEXT);
+            CREATE TABLE product_sizes (id INTEGER PRIMARY KEY, product_id INTEGER, size TEXT, price INTEGER);
+            CREATE INDEX chain_products_chain_id ON chain_products (chain_id);
+            CREATE INDEX product_sizes_product_id ON product_sizes (product_id);
+        """)
+
+    def load(self, menu: Dict):
+        for chain in menu["chains"]:
+            for category in chain["categories"]:
+                for product in category["products"]:
+                    cursor = self.conn.execute(
+                        "INSERT INTO chain_products (chain_id, name, category) VALUES (?, ?, ?)",
+                        (chain["id"], product["name"], category["name"]))
+                    self.conn.executemany(
+                        "INSERT INTO product_sizes (product_id, size, price) VALUES (?, ?, ?)",
+                        [(cursor.lastrowid, s["size"], s["price"]) for s in product["sizes"]])
+        self.conn.commit()
+
+    def fetch_existing_products(self, chain_id: str, page_size: int = 1000) -> Dict[int, Dict]:
+        products = {}
+        start = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, name, category FROM chain_products WHERE chain_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                (chain_id, page_size, start)).fetchall()
+            for product_id, name, category in rows:
+                products[product_id] = {"id": product_id, "name": name, "category": category,
+                                        "product_sizes": []}
+            if rows:
+                placeholders = ",".join("?" * len(rows))
+                for size_id, product_id, size, price in self.conn.execute(
+                        f"SELECT id, product_id, size, price FROM product_sizes"
+                        f" WHERE product_id IN ({placeholders})", [r[0] for r in rows]):
+                    products[product_id]["product_sizes"].append({"id": size_id, "size": size, "price": price})
+            if len(rows) < page_size:
+                return products
+            start += page_size
+
+
+class StageTimer:
+    """ステージごとの実時間とピークメモリ"""
+
+    def __init__(self):
+        self.results: List[Dict] = []
+
+    @contextlib.contextmanager
+    def stage(self, step: int, name: str, items: int):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.results.append({
+                "products": step,
+                "stage": name,
+                "seconds": round(seconds, 6),
+                "peak_bytes": peak,
+                "us_per_product": round(seconds / items * 1e6, 3) if items else None,
+            })
+            print(f"  {name:<20}{seconds:>10.3f}{peak / 2**20:>12.1f}"
+                  f"{self.results[-1]['us_per_product'] or 0:>12.1f}")
+
+
+def format_chains(catalog: List[Tuple[str, str, List[Dict]]]) -> List[Dict]:
+    """各チェーンをスクレイパーの _format_data に通す"""
+    scraper = CafeScraper()
+    chains_data = []
+    for chain_id, chain_name, products in catalog:
+        scraper.chain_id, scraper.chain_name = chain_id, chain_name
+        chains_data.append(scraper._format_data(products))
+    return chains_data
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def run_step(timer: StageTimer, chains: int, products: int, seed: int, workdir: str):
+    print(f"\n📦 {chains}チェーン・{products}商品")
+    print(f"  {'stage':<20}{'wall(s)':>10}{'peak(MiB)':>12}{'µs/product':>12}")
+
+    catalog = generate_catalog(chains, products, seed)
+    json_path = os.path.join(workdir, "ChainsMenu.json")
+    store_dir = os.path.join(workdir, "ChainsMenu")
+
+    with timer.stage(products, "format_data", products):
+        chains_data = format_chains(catalog)
+
+    with timer.stage(products, "update_initial", products), _quiet():
+        update_chains_menu(chains_data, json_path, store_dir)
+
+    updated = format_chains(mutate_catalog(catalog, seed=seed + 1))
+    with timer.stage(products, "update_incremental", products), _quiet():
+        changed = update_chains_menu(updated, json_path, store_dir)
+    print(f"  {'':<20}（変更 {len(changed)}チェーン）")
+
+    store = MenuStore(store_dir)
+    with timer.stage(products, "load", products):
+        menu = store.read_menu()
+
+    with timer.stage(products, "export", products):
+        store.export_merged(json_path)
+
+    with timer.stage(products, "delta_publish", products):
+        DeltaPublisher(store).publish()
+
+    # DB には変更前のメニューが入っている状態から、変更後のメニューのインポート計画を立てる
+    db = LocalMenuDB()
+    db.load(build_menu(catalog))
+    with timer.stage(products, "import_plan", products):
+        for chain in menu.chains:
+            plan_chain_import(chain, db.fetch_existing_products(chain.id))
+
+    with timer.stage(products, "checksum", products):
+        for chain in menu.chains:
+            chain_checksum(chain)
+
+    print(f"  ChainsMenu.json: {os.path.getsize(json_path) / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成メニューによるパイプラインの規模ベンチマーク")
+    parser.add_argument("--chains", type=int, default=1000, help="チェーン数")
+    parser.add_argument("--products", default="5000,20000,50000,100000",
+                        help="商品の総数（カンマ区切りで段階を指定）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("-o", "--output", help="結果のJSONの出力先")
+    args = parser.parse_args()
+    steps = [int(p) for p in args.products.split(",")]
+    if min(steps) < args.chains:
+        parser.error("--products の各段階は --chains 以上にしてください")
+
+    timer = StageTimer()
+    for products in steps:
+        with tempfile.TemporaryDirectory(prefix="cafe-doko-bench-") as workdir:
+            run_step(timer, args.chains, products, args.seed, workdir)
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(dumps(timer.results, indent=True))
+        print(f"\n💾 {args.output} に結果を保存しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+取得失敗時の耐障害性
+- LastKnownGoodCache: チェーンごとの最終取得成功データ（有効期限付き）
+- CircuitBreaker: 連続して失敗したホストへのリクエストを一定時間スキップ
+状態は .cache/scraper/ に保存し、実行をまたいで引き継ぐ
+"""
+import os
+import time
+from typing import Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+from menu_model import Chain, dumps, loads
+from menu_store import atomic_write, chain_filename
+
+DEFAULT_CACHE_DIR = ".cache/scraper"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """サーキットが開いているホストへのリクエスト"""
+
+    def __init__(self, host: str, retry_at: float):
+        self.host = host
+        self.retry_at = retry_at
+        retry = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(retry_at))
+        super().__init__(f"{host} は連続失敗のため {retry} までスキップします")
+
+
+class CircuitBreaker:
+    """
+    ホスト単位のサーキットブレーカー
+    failure_threshold 回連続で失敗すると cooldown 秒間リクエストを送らずに即失敗させる
+    クールダウン後は1回だけ試行し、成功すれば閉じ、失敗すれば再び開く
+    再び開くたびにクールダウンを2倍にする（max_cooldown まで）
+    状態は実行をまたいで引き継ぐため、cooldown は定期実行の間隔（1日）より長くする
+    """
+
+    def __init__(self, state_path: str = os.path.join(DEFAULT_CACHE_DIR, "circuit_breaker.json"),
+                 failure_threshold: int = 3, cooldown: float = 36 * 3600,
+                 max_cooldown: float = 7 * 24 * 3600,
+                 clock: Callable[[], float] = time.time):
+        self.state_path = state_path
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        try:
+            with open(state_path, "rb") as f:
+                self.state: Dict[str, Dict] = loads(f.read())
+        except FileNotFoundError:
+            self.state = {}
+
+    def _save(self):
+        atomic_write(self.state_path, dumps(self.state, indent=True))
+
+    def cooldown_for(self, failures: int) -> float:
+        """開いた回数（しきい値を超えた連続失敗数）に応じたクールダウン秒数"""
+        opened = max(failures - self.failure_threshold, 0)
+        return min(self.cooldown * 2 ** opened, self.max_cooldown)
+
+    def before_request(self, host: str):
+        entry = self.state.get(host)
+        if not entry or entry.get("opened_at") is None:
+            return
+        retry_at = entry["opened_at"] + self.cooldown_for(entry["failures"])
+        if self.clock() < retry_at:
+            raise CircuitOpenError(host, retry_at)
+
+    def record_success(self, host: str):
+        if host in self.state:
+            del self.state[host]
+            self._save()
+
+    def record_failure(self, host: str):
+        entry = self.state.setdefault(host, {"failures": 0, "opened_at": None})
+        entry["failures"] += 1
+        if entry["failures"] >= self.failure_threshold:
+            entry["opened_at"] = self.clock()
+        self._save()
+
+    def call(self, url: str, func: Callable[[], T]) -> T:
+        """url のホストに対するリクエスト func をブレーカー経由で実行"""
+        host = urlparse(url).hostname or url
+        self.before_request(host)
+        try:
+            result = func()
+        except Exception:
+            self.record_failure(host)
+            raise
+        self.record_success(host)
+        return result
+
+
+class LastKnownGoodCache:
+    """チェーンごとの最終取得成功データ"""
+
+    def __init__(self, root: str = os.path.join(DEFAULT_CACHE_DIR, "last_known_good"),
+                 max_age: float = 14 * 24 * 3600,
+                 clock: Callable[[], float] = time.time):
+        self.root = root
+        self.max_age = max_age
+        self.clock = clock
+
+    def _path(self, chain_id: str) -> str:
+        return os.path.join(self.root, chain_filename(chain_id))
+
+    def put(self, chain: Chain):
+        atomic_write(self._path(chain.id), dumps({
+            "saved_at": self.clock(),
+            "chain": chain.to_dict(),
+        }))
+
+    def get(self, chain_id: str) -> Optional[Chain]:
+        """有効期限内のデータを返す。期限切れ・未保存なら None"""
+        try:
+            with open(self._path(chain_id), "rb") as f:
+                entry = loads(f.read())
+        except FileNotFoundError:
+            return None
+        if self.clock() - entry["saved_at"] > self.max_age:
+            return None
+        return Chain.from_dict(entry["chain"])
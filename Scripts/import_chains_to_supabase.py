@@ -2,10 +2,17 @@
 """
 チェーン店メニューデータをSupabaseにインポートするスクリプト
 """
-import json
 import os
+import argparse
+from typing import Dict, List, Optional
 from supabase import create_client, Client
 
+from menu_checksum import Checksum, Row, chain_checksum, chain_rows, diff_rows
+from menu_model import Chain
+from menu_store import open_store
+from import_planner import ImportPlan, plan_chain_import
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
 # Supabase接続情報
 SUPABASE_URL = "https://dlwjajmdqopypgzkiwut.supabase.co"
 SUPABASE_KEY = os.getenv("CAFE_DOKO_API_KEY")
@@ -18,90 +25,210 @@ if not SUPABASE_KEY:
 # Supabaseクライアント初期化
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def import_chains():
-    """ChainsMenu.jsonからデータを読み込んでSupabaseに投入"""
+def fetch_existing_products(chain_id: str, page_size: int = 1000) -> Dict[int, Dict]:
+    """チェーンの既存商品（サイズ込み）を商品IDをキーに取得"""
+    products = {}
+    start = 0
+    while True:
+        rows = (
+            supabase.table("chain_products")
+            .select("id,name,category,product_sizes(id,size,price)")
+            .eq("chain_id", chain_id)
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+            .data
+        )
+        for row in rows:
+            products[row["id"]] = row
+        if len(rows) < page_size:
+            return products
+        start += page_size
+
+def apply_size_changes(plan: ImportPlan):
+    """既存商品のサイズ変更をまとめて反映"""
+    for size_id, price in plan.size_updates:
+        supabase.table("product_sizes").update({"price": price}).eq("id", size_id).execute()
+    if plan.size_inserts:
+        supabase.table("product_sizes").insert(plan.size_inserts).execute()
+    # メニューから消えたサイズを削除
+    if plan.size_deletes:
+        supabase.table("product_sizes").delete().in_("id", plan.size_deletes).execute()
+
+def delete_products(product_ids: List[int]):
+    """重複登録・メニューから消えた商品をサイズごと削除"""
+    if product_ids:
+        supabase.table("product_sizes").delete().in_("product_id", product_ids).execute()
+        supabase.table("chain_products").delete().in_("id", product_ids).execute()
+
+def import_chain(chain: Chain, prune: bool = False):
+    """1チェーン分の商品・サイズを反映（prune=True ならメニューに存在しない既存商品を削除）"""
+    chain_id = chain.id
+    chain_name = chain.name
+    keywords = chain.keywords or []
     
-    # JSONファイルを読み込み
-    with open("Resources/ChainsMenu.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
+    print(f"🏪 {chain_name} を処理中...")
     
-    chains = data["chains"]
-    print(f"📚 {len(chains)}個のチェーン店を処理します\n")
+    # 1. チェーン店マスターに挿入
+    try:
+        chain_result = supabase.table("chains").upsert({
+            "id": chain_id,
+            "name": chain_name,
+            "keywords": keywords
+        }).execute()
+        print(f"  ✅ チェーン店マスター登録完了")
+    except Exception as e:
+        print(f"  ❌ チェーン店マスター登録エラー: {e}")
+        return
     
-    for chain in chains:
-        chain_id = chain["id"]
-        chain_name = chain["name"]
-        keywords = chain.get("keywords", [])
-        
-        print(f"🏪 {chain_name} を処理中...")
-        
-        # 1. チェーン店マスターに挿入
+    # 2. 既存商品を取得し、名前で照合して反映内容を決める
+    try:
+        plan = plan_chain_import(chain, fetch_existing_products(chain_id), prune)
+    except Exception as e:
+        print(f"  ❌ 既存商品の取得エラー: {e}")
+        return
+    
+    # 3. 既存商品は更新、見つからなければ挿入
+    inserted_count = 0
+    
+    try:
+        for product_id, name, category_name in plan.renames:
+            supabase.table("chain_products").update({
+                "name": name,
+                "category": category_name
+            }).eq("id", product_id).execute()
+        apply_size_changes(plan)
+        delete_products(plan.product_deletes)
+    except Exception as e:
+        print(f"  ⚠️  既存商品の更新エラー: {e}")
+    
+    for name, match in plan.ambiguous:
+        names = "、".join(f"{n}(id={pid}, {score:.2f})" for pid, n, score in match.candidates)
+        print(f"  ⚠️  商品 {name} は候補が曖昧なため新規登録します: {names}")
+    
+    for category_name, product in plan.new_products:
         try:
-            chain_result = supabase.table("chains").upsert({
-                "id": chain_id,
-                "name": chain_name,
-                "keywords": keywords
+            # 商品を挿入
+            product_result = supabase.table("chain_products").insert({
+                "chain_id": chain_id,
+                "name": product.name,
+                "category": category_name
             }).execute()
-            print(f"  ✅ チェーン店マスター登録完了")
-        except Exception as e:
-            print(f"  ❌ チェーン店マスター登録エラー: {e}")
-            continue
-        
-        # 2. 商品とサイズを挿入
-        product_count = 0
-        size_count = 0
-        
-        for category_data in chain.get("categories", []):
-            category_name = category_data.get("name", "ドリンク")
             
-            for product in category_data.get("products", []):
-                try:
-                    # 商品を挿入
-                    product_result = supabase.table("chain_products").insert({
-                        "chain_id": chain_id,
-                        "name": product["name"],
-                        "category": category_name
-                    }).execute()
-                    
-                    product_id = product_result.data[0]["id"]
-                    product_count += 1
-                    
-                    # サイズと価格を挿入
-                    for size in product["sizes"]:
-                        supabase.table("product_sizes").insert({
-                            "product_id": product_id,
-                            "size": size["size"],
-                            "price": size["price"]
-                        }).execute()
-                        size_count += 1
-                    
-                except Exception as e:
-                    print(f"  ⚠️  商品 {product['name']} 登録エラー: {e}")
-        
-        print(f"  ✅ 商品 {product_count}件、サイズ {size_count}件 登録完了\n")
+            product_id = product_result.data[0]["id"]
+            inserted_count += 1
+            
+            # サイズと価格をまとめて挿入
+            supabase.table("product_sizes").insert([
+                {"product_id": product_id, "size": size.size, "price": size.price}
+                for size in product.sizes
+            ]).execute()
+            
+        except Exception as e:
+            print(f"  ⚠️  商品 {product.name} 登録エラー: {e}")
+    
+    print(f"  ✅ 商品 更新{plan.matched}件・新規{inserted_count}件・削除{len(plan.product_deletes)}件、"
+          f"サイズ変更 {plan.size_changes}件")
+    if plan.unmatched:
+        print(f"  ℹ️ メニューに存在しない既存商品 {plan.unmatched}件（--prune で削除）")
+    print()
+
+def import_chains(profiler: Optional[Profiler] = None, prune: bool = False) -> List[Chain]:
+    """
+    ChainsMenu.jsonからデータを読み込んでSupabaseに投入
+    商品名の表記ゆれを吸収して既存商品に対応付け、IDを保ったまま更新する
+    """
+    profiler = profiler or Profiler()
+    
+    # チェーン別シャードから読み込み（読み込み時に構造を検証）
+    with profiler.stage("load"):
+        chains = open_store("Resources/ChainsMenu.json").read_menu().chains
+    print(f"📚 {len(chains)}個のチェーン店を処理します\n")
+    
+    for chain in chains:
+        with profiler.stage(f"import-{chain.id}"):
+            import_chain(chain, prune)
     
     print("🎉 すべてのデータのインポートが完了しました！")
+    return chains
 
-def verify_data():
-    """データが正しく登録されているか確認"""
+def fetch_remote_rows(chain_id: str, page_size: int = 1000) -> List[Row]:
+    """DB上のチェーンの (カテゴリー, 商品名, サイズ, 価格) をページングして取得"""
+    rows = []
+    for product in fetch_existing_products(chain_id, page_size).values():
+        for size in product.get("product_sizes") or []:
+            rows.append((product["category"], product["name"], size["size"], size["price"]))
+    return rows
+
+def verify_data(chains: Optional[List[Chain]] = None, show: int = 10) -> List[str]:
+    """
+    ローカルのメニューとDBをチェーン単位のチェックサムで照合し、食い違ったチェーンIDを返す
+    件数だけでなく商品名・サイズ・価格の違いも検出する
+    """
     print("\n📊 データ確認中...")
     
-    chains_count = supabase.table("chains").select("id", count="exact").execute()
-    products_count = supabase.table("chain_products").select("id", count="exact").execute()
-    sizes_count = supabase.table("product_sizes").select("id", count="exact").execute()
+    if chains is None:
+        chains = open_store("Resources/ChainsMenu.json").read_menu().chains
     
-    print(f"  チェーン店: {chains_count.count}件")
-    print(f"  商品: {products_count.count}件")
-    print(f"  サイズ: {sizes_count.count}件")
+    diverged = []
+    for chain in chains:
+        expected = chain_checksum(chain)
+        try:
+            remote_rows = fetch_remote_rows(chain.id)
+        except Exception as e:
+            print(f"  ❌ {chain.name}: 取得エラー: {e}")
+            diverged.append(chain.id)
+            continue
+        actual = Checksum(remote_rows)
+        
+        if actual == expected:
+            print(f"  ✅ {chain.name}: {expected.rows}行 一致 ({expected.hexdigest})")
+            continue
+        
+        diverged.append(chain.id)
+        print(f"  ❌ {chain.name}: 不一致 ローカル {expected.rows}行 ({expected.hexdigest})"
+              f" / DB {actual.rows}行 ({actual.hexdigest})")
+        missing, extra = diff_rows(chain_rows(chain), remote_rows)
+        for label, rows in (("DBに無い", missing), ("DBにだけある", extra)):
+            for category, name, size, price in rows[:show]:
+                print(f"      {label}: [{category}] {name} {size} ¥{price}")
+            if len(rows) > show:
+                print(f"      {label}: ほか {len(rows) - show}行")
+    
+    # メニューに存在しないチェーンがDBに残っていないか
+    local_ids = {chain.id for chain in chains}
+    remote_ids = {row["id"] for row in supabase.table("chains").select("id").execute().data}
+    for chain_id in sorted(remote_ids - local_ids):
+        print(f"  ⚠️  {chain_id}: メニューに存在しないチェーンがDBにあります")
+        diverged.append(chain_id)
+    
+    if diverged:
+        print(f"\n  不一致のチェーン: {', '.join(diverged)}")
+    else:
+        print(f"\n  全{len(chains)}チェーン一致")
+    return diverged
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="チェーン店メニューデータ Supabase インポートツール")
+    parser.add_argument("--verify-only", action="store_true",
+                        help="インポートせず、チェックサムによる照合だけを行う")
+    parser.add_argument("--prune", action="store_true",
+                        help="メニューに存在しない既存商品をサイズごと削除する")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, "import")
+    
     print("=" * 60)
     print("  チェーン店メニューデータ Supabase インポートツール")
     print("=" * 60)
     print()
     
-    import_chains()
-    verify_data()
+    chains = None if args.verify_only else import_chains(profiler, args.prune)
+    with profiler.stage("verify"):
+        diverged = verify_data(chains)
+    profiler.write_summary()
     
+    if diverged:
+        exit(1)
     print("\n✨ 完了！")
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+インポート計画の作成（DBアクセスなし）
+既存商品（fetch_existing_products の戻り値と同じ形式）と新しいチェーンのメニューを照合し、
+商品の更新・新規登録とサイズ行の追加・価格更新・削除を ImportPlan にまとめる
+実行は import_chains_to_supabase.py、規模の計測は bench_pipeline.py が行う
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from menu_model import Category, Chain, Product, Size
+from product_matcher import MatchResult, ProductMatcher, normalize_name
+
+
+class ImportPlan:
+    """1チェーン分の反映内容"""
+    __slots__ = ("chain_id", "renames", "new_products", "ambiguous", "product_deletes",
+                 "size_inserts", "size_updates", "size_deletes", "matched", "unmatched")
+
+    def __init__(self, chain_id: str):
+        self.chain_id = chain_id
+        # (商品ID, 新しい商品名, 新しいカテゴリー)
+        self.renames: List[Tuple[int, str, str]] = []
+        # (カテゴリー, 商品) 既存に対応付けられなかった商品
+        self.new_products: List[Tuple[str, Product]] = []
+        # (商品名, 照合結果) 候補が拮抗したため新規登録する商品
+        self.ambiguous: List[Tuple[str, MatchResult]] = []
+        # 削除する既存商品ID（重複登録、prune 時はメニューに存在しない商品も）
+        self.product_deletes: List[int] = []
+        # 既存商品に対するサイズ行の変更
+        self.size_inserts: List[Dict] = []
+        self.size_updates: List[Tuple[int, int]] = []  # (サイズ行ID, 価格)
+        self.size_deletes: List[int] = []
+        self.matched = 0
+        # 削除せずに残した、メニューに存在しない既存商品の数
+        self.unmatched = 0
+
+    @property
+    def size_changes(self) -> int:
+        new_sizes = sum(len(product.sizes) for _, product in self.new_products)
+        return len(self.size_inserts) + len(self.size_updates) + len(self.size_deletes) + new_sizes
+
+
+def plan_sizes(plan: ImportPlan, product_id: int, existing_sizes: List[Dict], sizes: Iterable[Size]):
+    """既存サイズとの差分を plan に追加"""
+    current = {row["size"]: row for row in existing_sizes}
+    for size in sizes:
+        row = current.pop(size.size, None)
+        if row is None:
+            plan.size_inserts.append({"product_id": product_id, "size": size.size, "price": size.price})
+        elif row["price"] != size.price:
+            plan.size_updates.append((row["id"], size.price))
+    # メニューから消えたサイズ
+    plan.size_deletes.extend(row["id"] for row in current.values())
+
+
+def plan_chain_import(chain: Chain, existing: Dict[int, Dict], prune: bool = False) -> ImportPlan:
+    """
+    商品名の表記ゆれを吸収して既存商品に対応付け、IDを保ったまま更新する計画を作る
+    existing は {商品ID: {"id", "name", "category", "product_sizes": [{"id", "size", "price"}]}}
+    1. 正規化後の名前が一致する商品をチェーン全体で先に対応付ける（同名の既存商品が複数あれば最小のID）
+       同名の残りの既存商品は過去の重複登録なので削除する
+    2. 残った商品だけを、残った既存商品とあいまい照合する
+    prune=True ならメニューに存在しない既存商品も削除する
+    """
+    plan = ImportPlan(chain.id)
+    matcher = ProductMatcher()
+    matcher.add_all((pid, row["name"]) for pid, row in existing.items())
+    claimed = set()
+    assigned: Dict[int, int] = {}  # id(product) → 既存商品ID
+
+    def claim(category: Category, product: Product, product_id: int):
+        claimed.add(product_id)
+        assigned[id(product)] = product_id
+        row = existing[product_id]
+        if row["name"] != product.name or row["category"] != category.name:
+            plan.renames.append((product_id, product.name, category.name))
+        plan_sizes(plan, product_id, row.get("product_sizes") or [], product.sizes)
+        plan.matched += 1
+
+    # 1. 完全一致（あいまい照合が後続の商品の完全一致先を奪わないように先に確定する）
+    exact_names = set()
+    for category in chain.categories:
+        for product in category.products:
+            ids = matcher.exact_ids(product.name, exclude=claimed)
+            if ids:
+                claim(category, product, ids[0])
+                exact_names.add(normalize_name(product.name))
+    duplicates = [pid for pid in existing
+                  if pid not in claimed and normalize_name(existing[pid]["name"]) in exact_names]
+    plan.product_deletes.extend(sorted(duplicates))
+    excluded = claimed | set(duplicates)
+
+    # 2. あいまい照合
+    for category in chain.categories:
+        for product in category.products:
+            if id(product) in assigned:
+                continue
+            match = matcher.match(product.name, exclude=excluded)
+            if match.product_id is None:
+                if match.ambiguous:
+                    plan.ambiguous.append((product.name, match))
+                plan.new_products.append((category.name, product))
+                continue
+            claim(category, product, match.product_id)
+            excluded.add(match.product_id)
+
+    stale = sorted(pid for pid in existing if pid not in excluded)
+    if prune:
+        plan.product_deletes.extend(stale)
+    else:
+        plan.unmatched = len(stale)
+    return plan
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+チェーン単位の順序非依存チェックサム
+- (カテゴリー, 商品名, サイズ, 価格) の各行を blake2b で 64bit に要約し、2^64 を法として加算
+- 加算なので行の並び順・ページングの分け方に依存せず、重複行も区別できる（XOR と違い相殺されない）
+- 件数も合わせて比較する
+ローカルの Chain とリモートの行から同じ値を計算し、どのチェーンが食い違っているかを特定する
+"""
+import hashlib
+from collections import Counter
+from typing import Iterable, Iterator, List, Tuple
+
+from menu_model import Chain
+
+Row = Tuple[str, str, str, int]
+
+_MASK = (1 << 64) - 1
+
+
+def row_hash(row: Row) -> int:
+    """1行の 64bit ハッシュ（区切りに NUL を使い、連結の曖昧さをなくす）"""
+    category, product, size, price = row
+    key = f"{category}\0{product}\0{size}\0{int(price)}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+class Checksum:
+    """行の多重集合に対するチェックサム（件数, ハッシュの総和）"""
+    __slots__ = ("rows", "total")
+
+    def __init__(self, rows: Iterable[Row] = ()):
+        self.rows = 0
+        self.total = 0
+        self.update(rows)
+
+    def add(self, row: Row):
+        self.rows += 1
+        self.total = (self.total + row_hash(row)) & _MASK
+
+    def update(self, rows: Iterable[Row]):
+        for row in rows:
+            self.add(row)
+
+    @property
+    def hexdigest(self) -> str:
+        return f"{self.total:016x}"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Checksum) and (self.rows, self.total) == (other.rows, other.total)
+
+    def __repr__(self) -> str:
+        return f"Checksum({self.rows} rows, {self.hexdigest})"
+
+
+def chain_rows(chain: Chain) -> Iterator[Row]:
+    """ローカルのチェーンを検証用の行に展開"""
+    for category in chain.categories:
+        for product in category.products:
+            for size in product.sizes:
+                yield (category.name, product.name, size.size, size.price)
+
+
+def chain_checksum(chain: Chain) -> Checksum:
+    return Checksum(chain_rows(chain))
+
+
+def diff_rows(expected: Iterable[Row], actual: Iterable[Row]) -> Tuple[List[Row], List[Row]]:
+    """食い違ったチェーンについて (リモートに無い行, リモートにだけある行) を返す"""
+    expected_rows = Counter((c, p, s, int(price)) for c, p, s, price in expected)
+    actual_rows = Counter((c, p, s, int(price)) for c, p, s, price in actual)
+    return (
+        sorted((expected_rows - actual_rows).elements()),
+        sorted((actual_rows - expected_rows).elements()),
+    )
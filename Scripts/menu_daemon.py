@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+メニュー常駐デーモン
+- HTTPセッション・キャッシュ・スケジューラ・解析済みメニューをメモリに保持
+- 内部スケジュールでスクレイピングを実行（取得対象は RecrawlScheduler が選択）
+- ローカルHTTPでメニューを配信
+    GET /menu              統合メニュー（ChainsMenu.json と同じ形式）
+    GET /chains            チェーンID一覧とバージョン（manifest.json）
+    GET /chains/<chain_id> チェーン単位のメニュー
+    GET /healthz           稼働状況
+  ETag / If-None-Match（304）と gzip に対応
+  応答はシャードのバイト列と事前圧縮した gzip をそのまま返し、変更がない限り再シリアライズしない
+
+実行方法: python3 Scripts/menu_daemon.py --port 8787 --interval 3600
+"""
+import argparse
+import gzip
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+
+from menu_model import dumps
+from menu_store import MenuStore, merge_chain_bytes, open_store
+from fetch_resilience import CircuitBreaker, LastKnownGoodCache
+from recrawl_scheduler import RecrawlScheduler
+from sitemap_index import SitemapIndex
+from scrape_all_chains import CafeScraper, build_scrapers, run_pipeline
+
+JSON_PATH = "Resources/ChainsMenu.json"
+
+
+class Payload:
+    """配信用に事前計算した本文・gzip・ETag"""
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = f'"{etag or hashlib.sha256(body).hexdigest()}"'
+
+
+class MenuSnapshot:
+    """ある時点のメニュー一式（不変。更新時は新しいスナップショットに差し替える）"""
+    __slots__ = ("version", "menu", "manifest", "chains")
+
+    def __init__(self, version: int, menu: Payload, manifest: Payload, chains: Dict[str, Payload]):
+        self.version = version
+        self.menu = menu
+        self.manifest = manifest
+        self.chains = chains
+
+
+class MenuCache:
+    """ストアから読み込んだメニューを保持し、変更されたシャードだけ読み直す"""
+
+    def __init__(self, store: MenuStore):
+        self.store = store
+        self.snapshot: Optional[MenuSnapshot] = None
+        self._lock = threading.Lock()
+
+    def load(self, changed: Optional[Iterable[str]] = None):
+        """changed を省略すると全シャードを読み込む"""
+        with self._lock:
+            self.store.reload()
+            manifest = self.store.manifest
+            previous = self.snapshot.chains if self.snapshot else {}
+            reload_ids = set(manifest["chains"]) if changed is None or self.snapshot is None else set(changed)
+
+            chains = {}
+            for chain_id, entry in manifest["chains"].items():
+                if chain_id in reload_ids or chain_id not in previous:
+                    chains[chain_id] = Payload(self.store.read_raw(chain_id), entry["sha256"])
+                else:
+                    chains[chain_id] = previous[chain_id]
+
+            # 統合メニューはメモリ上のシャードから組み立てる（変更のないシャードを読み直さない）
+            merged = merge_chain_bytes((chains[cid].body for cid in manifest["chains"]),
+                                       manifest.get("last_updated"), manifest["version"])
+            # 参照の差し替えだけで切り替わるので、配信側はロック不要
+            self.snapshot = MenuSnapshot(
+                manifest["version"],
+                Payload(merged),
+                Payload(dumps(manifest)),
+                chains,
+            )
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Accept-Encoding が gzip を許可しているか（q=0 は拒否。gzip の指定がなければ * に従う）"""
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class MenuRequestHandler(BaseHTTPRequestHandler):
+    cache: MenuCache = None
+    status: Dict = {}
+
+    def _resolve(self, snapshot: MenuSnapshot) -> Optional[Payload]:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/menu":
+            return snapshot.menu
+        if path == "/chains":
+            return snapshot.manifest
+        if path.startswith("/chains/"):
+            return snapshot.chains.get(path[len("/chains/"):])
+        if path == "/healthz":
+            return Payload(dumps(dict(self.status, version=snapshot.version)))
+        return None
+
+    def _send(self, head_only: bool):
+        snapshot = self.cache.snapshot
+        payload = self._resolve(snapshot) if snapshot else None
+        if payload is None:
+            self.send_error(404)
+            return
+
+        if self.headers.get("If-None-Match") == payload.etag:
+            self.send_response(304)
+            self.send_header("ETag", payload.etag)
+            self.end_headers()
+            return
+
+        use_gzip = accepts_gzip(self.headers.get("Accept-Encoding"))
+        body = payload.gzipped if use_gzip else payload.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", payload.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(head_only=False)
+
+    def do_HEAD(self):
+        self._send(head_only=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScrapeLoop(threading.Thread):
+    """interval 秒ごとにパイプラインを実行し、変更されたチェーンだけキャッシュを更新"""
+
+    def __init__(self, cache: MenuCache, interval: float, status: Dict, crawl_all: bool = False):
+        super().__init__(daemon=True)
+        self.cache = cache
+        self.interval = interval
+        self.status = status
+        self.crawl_all = crawl_all
+        self._stop_event = threading.Event()
+
+        # 実行をまたいで使い回す状態
+        self.session = requests.Session()
+        self.breaker = CircuitBreaker()
+        self.scrapers = build_scrapers(self.breaker, self.session)
+        self.scheduler = RecrawlScheduler()
+        self.last_known_good = LastKnownGoodCache()
+        self.sitemaps = SitemapIndex(CafeScraper.DEFAULT_HEADERS, self.breaker, get=self.session.get)
+
+    def run_once(self) -> Tuple[float, int]:
+        started = time.monotonic()
+        # サイトマップは実行ごとに1回だけ取得し直す
+        self.sitemaps.reset_refreshed()
+        changed = run_pipeline(self.scrapers, self.scheduler, self.last_known_good,
+                               self.sitemaps, crawl_all=self.crawl_all)
+        if changed:
+            self.cache.load(changed)
+        return time.monotonic() - started, len(changed)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                seconds, changed = self.run_once()
+                self.status.update(last_run=time.strftime("%Y-%m-%d %H:%M:%S"),
+                                   last_run_seconds=round(seconds, 3),
+                                   last_changed=changed, last_error=None)
+            except Exception as e:
+                print(f"❌ スクレイピング実行エラー: {e}")
+                self.status.update(last_error=str(e))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="メニュー常駐デーモン")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=8787, help="待ち受けポート")
+    parser.add_argument("--interval", type=float, default=3600,
+                        help="スクレイピングの実行間隔（秒）")
+    parser.add_argument("--no-scrape", action="store_true",
+                        help="スクレイピングを行わず配信のみ")
+    parser.add_argument("--all", action="store_true",
+                        help="スケジューラを使わず毎回全チェーンを取得")
+    args = parser.parse_args()
+
+    cache = MenuCache(open_store(JSON_PATH))
+    cache.load()
+    status = {"started": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    loop = None
+    if not args.no_scrape:
+        loop = ScrapeLoop(cache, args.interval, status, crawl_all=args.all)
+        loop.start()
+
+    MenuRequestHandler.cache = cache
+    MenuRequestHandler.status = status
+    server = ThreadingHTTPServer((args.host, args.port), MenuRequestHandler)
+    print(f"🚀 http://{args.host}:{args.port}/menu で配信中（v{cache.snapshot.version}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 停止します")
+    finally:
+        if loop:
+            loop.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
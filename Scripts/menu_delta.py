@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+メニューのバージョン間差分パッチ
+- Resources/ChainsMenu/history/v<N>.json.gz : バージョン N の統合メニュー（直近 keep 件）
+- Resources/ChainsMenu/patches/<N>-<最新>.json.gz : 各バージョンから最新への差分
+- Resources/ChainsMenu/patches/index.json : 最新バージョンと利用可能なパッチの一覧
+クライアントは保持している ChainsMenu.json の "version" を N とし、
+index.json を見て "<N>" のパッチだけを取得・適用する（index に無ければ ChainsMenu.json 全体を取得し直す）
+取得時に index.json の latest を読むと、その間の公開と競合するため使わない
+
+パッチ形式（JSON Patch より小さく、商品名キーで適用できる独自形式）:
+{"from": N, "to": M, "last_updated": "...", "ops": [
+  ["put_chain", {チェーン全体}],                      # 追加 / 構造が変わったチェーン
+  ["del_chain", chain_id],
+  ["put_product", chain_id, category, {商品}],        # カテゴリー内の商品を置換（無ければ末尾に追加）
+  ["del_product", chain_id, category, product_name],
+  ["order", [chain_id, ...]]                          # チェーンの並び順が変わった場合のみ
+]}
+"""
+import copy
+import gzip
+import os
+import re
+from typing import Dict, List, Optional
+
+from menu_model import dumps, loads
+from menu_store import MenuStore, atomic_write
+
+_HISTORY_FILE = re.compile(r"^v(\d+)\.json\.gz$")
+
+
+def _gzip(raw: bytes) -> bytes:
+    # mtime=0 で同じ内容なら同じバイト列にする（Git の差分を出さない）
+    return gzip.compress(raw, compresslevel=9, mtime=0)
+
+
+def _products_by_name(category: Dict) -> Optional[Dict[str, Dict]]:
+    products = {p["name"]: p for p in category["products"]}
+    return products if len(products) == len(category["products"]) else None
+
+
+def _diff_chain(old: Dict, new: Dict) -> Optional[List]:
+    """
+    同じチェーンの商品単位の差分
+    カテゴリー構成・並び順・チェーン属性が変わった場合は None（チェーンごと置換）
+    """
+    if {k: v for k, v in old.items() if k != "categories"} != {k: v for k, v in new.items() if k != "categories"}:
+        return None
+    if [c["name"] for c in old["categories"]] != [c["name"] for c in new["categories"]]:
+        return None
+
+    ops = []
+    for old_cat, new_cat in zip(old["categories"], new["categories"]):
+        old_products = _products_by_name(old_cat)
+        new_products = _products_by_name(new_cat)
+        if old_products is None or new_products is None:
+            return None
+        # 適用後の並び順が一致すること（既存は位置を保ち、新規は末尾に追加される）
+        kept = [name for name in old_products if name in new_products]
+        added = [name for name in new_products if name not in old_products]
+        if kept + added != list(new_products):
+            return None
+        for name in old_products:
+            if name not in new_products:
+                ops.append(["del_product", new["id"], new_cat["name"], name])
+        for name, product in new_products.items():
+            if old_products.get(name) != product:
+                ops.append(["put_product", new["id"], new_cat["name"], product])
+    return ops
+
+
+def diff_menus(old: Dict, new: Dict) -> List:
+    """統合メニュー old → new のパッチ操作列"""
+    old_chains = {c["id"]: c for c in old.get("chains", [])}
+    new_chains = {c["id"]: c for c in new.get("chains", [])}
+
+    ops = []
+    for chain_id in old_chains:
+        if chain_id not in new_chains:
+            ops.append(["del_chain", chain_id])
+    for chain_id, chain in new_chains.items():
+        previous = old_chains.get(chain_id)
+        if previous == chain:
+            continue
+        chain_ops = _diff_chain(previous, chain) if previous is not None else None
+        if chain_ops is None:
+            ops.append(["put_chain", chain])
+        else:
+            ops.extend(chain_ops)
+
+    # 適用後の並び（既存は位置を保ち、新規は末尾）が異なる場合だけ順序を送る
+    applied_order = [cid for cid in old_chains if cid in new_chains]
+    applied_order += [cid for cid in new_chains if cid not in old_chains]
+    if applied_order != list(new_chains):
+        ops.append(["order", list(new_chains)])
+    return ops
+
+
+def apply_delta(menu: Dict, delta: Dict) -> Dict:
+    """パッチを適用した新しい統合メニューを返す（クライアント実装の参照用）"""
+    result = copy.deepcopy(menu)
+    chains = result.setdefault("chains", [])
+    index = {c["id"]: i for i, c in enumerate(chains)}
+
+    def find_category(chain_id: str, category_name: str) -> Dict:
+        chain = chains[index[chain_id]]
+        return next(c for c in chain["categories"] if c["name"] == category_name)
+
+    for op in delta["ops"]:
+        kind = op[0]
+        if kind == "put_chain":
+            chain = op[1]
+            if chain["id"] in index:
+                chains[index[chain["id"]]] = chain
+            else:
+                index[chain["id"]] = len(chains)
+                chains.append(chain)
+        elif kind == "del_chain":
+            chains.pop(index[op[1]])
+            index = {c["id"]: i for i, c in enumerate(chains)}
+        elif kind == "put_product":
+            products = find_category(op[1], op[2])["products"]
+            for i, product in enumerate(products):
+                if product["name"] == op[3]["name"]:
+                    products[i] = op[3]
+                    break
+            else:
+                products.append(op[3])
+        elif kind == "del_product":
+            category = find_category(op[1], op[2])
+            category["products"] = [p for p in category["products"] if p["name"] != op[3]]
+        elif kind == "order":
+            by_id = {c["id"]: c for c in chains}
+            chains[:] = [by_id[cid] for cid in op[1]]
+            index = {c["id"]: i for i, c in enumerate(chains)}
+        else:
+            raise ValueError(f"未知のパッチ操作です: {kind}")
+
+    if "last_updated" in delta:
+        result["last_updated"] = delta["last_updated"]
+    result["version"] = delta["to"]
+    return result
+
+
+class DeltaPublisher:
+    """ストアのバージョンごとに履歴を残し、最新へのパッチと index.json を生成する"""
+
+    def __init__(self, store: MenuStore, keep: int = 8):
+        self.store = store
+        self.keep = keep
+        self.history_dir = os.path.join(store.root, "history")
+        self.patches_dir = os.path.join(store.root, "patches")
+
+    def _history_versions(self) -> List[int]:
+        if not os.path.isdir(self.history_dir):
+            return []
+        versions = []
+        for name in os.listdir(self.history_dir):
+            m = _HISTORY_FILE.match(name)
+            if m:
+                versions.append(int(m.group(1)))
+        return sorted(versions)
+
+    def _history_path(self, version: int) -> str:
+        return os.path.join(self.history_dir, f"v{version}.json.gz")
+
+    def publish(self) -> Dict:
+        """現在のバージョンを履歴に追加し、パッチと index.json を作り直す"""
+        latest = self.store.manifest["version"]
+        merged = self.store.merged_bytes()
+        atomic_write(self._history_path(latest), _gzip(merged))
+
+        versions = self._history_versions()
+        for version in versions[:-self.keep]:
+            os.unlink(self._history_path(version))
+        versions = versions[-self.keep:]
+
+        new_menu = loads(merged)
+        patches = {}
+        for version in versions:
+            if version == latest:
+                continue
+            with open(self._history_path(version), "rb") as f:
+                old_menu = loads(gzip.decompress(f.read()))
+            delta = {
+                "from": version,
+                "to": latest,
+                "last_updated": new_menu.get("last_updated"),
+                "ops": diff_menus(old_menu, new_menu),
+            }
+            data = _gzip(dumps(delta))
+            filename = f"{version}-{latest}.json.gz"
+            atomic_write(os.path.join(self.patches_dir, filename), data)
+            patches[str(version)] = {"file": filename, "bytes": len(data), "ops": len(delta["ops"])}
+
+        index = {
+            "latest": latest,
+            "last_updated": new_menu.get("last_updated"),
+            "full": {"bytes": len(merged), "gzip_bytes": len(_gzip(merged))},
+            "patches": patches,
+        }
+        atomic_write(os.path.join(self.patches_dir, "index.json"), dumps(index, indent=True))
+
+        # 最新以外を起点にしない古いパッチを削除
+        current = {entry["file"] for entry in patches.values()} | {"index.json"}
+        for name in os.listdir(self.patches_dir):
+            if name not in current:
+                os.unlink(os.path.join(self.patches_dir, name))
+        return index
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+メニューデータの型付きモデルとシリアライザ
+- Chain / Category / Product / Size は __slots__ で省メモリ化
+- 読み込み時に1パスで検証
+- orjson がインストールされていれば高速バックエンドを使用
+"""
+import json
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson は任意依存
+    orjson = None
+
+
+class MenuValidationError(ValueError):
+    """メニューデータの構造・値が不正な場合の例外"""
+
+
+class Size:
+    """サイズと価格"""
+    __slots__ = ("size", "price")
+
+    def __init__(self, size: str, price: int):
+        self.size = size
+        self.price = price
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: str = "") -> "Size":
+        size = data.get("size")
+        price = data.get("price")
+        if not isinstance(size, str) or not size:
+            raise MenuValidationError(f"{path}.size が不正です: {size!r}")
+        if type(price) is not int or price < 0:
+            raise MenuValidationError(f"{path}.price が不正です: {price!r}")
+        return cls(size, price)
+
+    def to_dict(self) -> Dict:
+        return {"size": self.size, "price": self.price}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Size) and (self.size, self.price) == (other.size, other.price)
+
+    def __repr__(self) -> str:
+        return f"Size({self.size!r}, {self.price})"
+
+
+class Product:
+    """商品（サイズはタプルで保持）"""
+    __slots__ = ("name", "category", "sizes")
+
+    def __init__(self, name: str, category: str, sizes: Iterable[Size]):
+        self.name = name
+        self.category = category
+        self.sizes = tuple(sizes)
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: str = "", category: Optional[str] = None) -> "Product":
+        name = data.get("name")
+        if not isinstance(name, str) or not name:
+            raise MenuValidationError(f"{path}.name が不正です: {name!r}")
+        cat = data.get("category", category)
+        if not isinstance(cat, str) or not cat:
+            raise MenuValidationError(f"{path}.category が不正です: {cat!r}")
+        sizes = data.get("sizes")
+        if not isinstance(sizes, list) or not sizes:
+            raise MenuValidationError(f"{path}.sizes が空または不正です")
+        return cls(name, cat, [
+            Size.from_dict(s, f"{path}.sizes[{i}]") for i, s in enumerate(sizes)
+        ])
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "sizes": [s.to_dict() for s in self.sizes],
+        }
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Product)
+            and (self.name, self.category, self.sizes) == (other.name, other.category, other.sizes)
+        )
+
+    def __repr__(self) -> str:
+        return f"Product({self.name!r}, {self.category!r}, {len(self.sizes)} sizes)"
+
+
+class Category:
+    """カテゴリーと所属商品"""
+    __slots__ = ("name", "products")
+
+    def __init__(self, name: str, products: Iterable[Product]):
+        self.name = name
+        self.products = list(products)
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: str = "") -> "Category":
+        name = data.get("name")
+        if not isinstance(name, str) or not name:
+            raise MenuValidationError(f"{path}.name が不正です: {name!r}")
+        products = data.get("products", [])
+        if not isinstance(products, list):
+            raise MenuValidationError(f"{path}.products が不正です")
+        return cls(name, [
+            Product.from_dict(p, f"{path}.products[{i}]", name) for i, p in enumerate(products)
+        ])
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "products": [p.to_dict() for p in self.products]}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Category) and (self.name, self.products) == (other.name, other.products)
+
+
+class Chain:
+    """チェーン店のメニュー"""
+    __slots__ = ("id", "name", "categories", "keywords")
+
+    def __init__(self, chain_id: str, name: str, categories: Iterable[Category],
+                 keywords: Optional[List[str]] = None):
+        self.id = chain_id
+        self.name = name
+        self.categories = list(categories)
+        self.keywords = keywords
+
+    @classmethod
+    def from_products(cls, chain_id: str, chain_name: str, products: List[Dict]) -> "Chain":
+        """スクレイパーの商品リスト（category付きdict）からカテゴリー別に組み立てる"""
+        categories: Dict[str, List[Product]] = {}
+        for i, p in enumerate(products):
+            product = Product.from_dict(p, f"{chain_id}.products[{i}]")
+            categories.setdefault(product.category, []).append(product)
+        return cls(chain_id, chain_name, [
+            Category(cat, prods) for cat, prods in categories.items()
+        ])
+
+    @classmethod
+    def from_dict(cls, data: Dict, path: str = "") -> "Chain":
+        chain_id = data.get("id")
+        if not isinstance(chain_id, str) or not chain_id:
+            raise MenuValidationError(f"{path}.id が不正です: {chain_id!r}")
+        path = f"{path}[{chain_id}]"
+        name = data.get("name")
+        if not isinstance(name, str) or not name:
+            raise MenuValidationError(f"{path}.name が不正です: {name!r}")
+        categories = data.get("categories", [])
+        if not isinstance(categories, list):
+            raise MenuValidationError(f"{path}.categories が不正です")
+        keywords = data.get("keywords")
+        if keywords is not None and not isinstance(keywords, list):
+            raise MenuValidationError(f"{path}.keywords が不正です")
+        return cls(chain_id, name, [
+            Category.from_dict(c, f"{path}.categories[{i}]") for i, c in enumerate(categories)
+        ], keywords)
+
+    def to_dict(self) -> Dict:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "categories": [c.to_dict() for c in self.categories],
+        }
+        if self.keywords is not None:
+            data["keywords"] = self.keywords
+        return data
+
+    def iter_products(self) -> Iterable[Product]:
+        for category in self.categories:
+            yield from category.products
+
+    def product_count(self) -> int:
+        return sum(len(c.products) for c in self.categories)
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Chain)
+            and (self.id, self.name, self.categories, self.keywords)
+            == (other.id, other.name, other.categories, other.keywords)
+        )
+
+    def __repr__(self) -> str:
+        return f"Chain({self.id!r}, {self.product_count()} products)"
+
+
+class Menu:
+    """ChainsMenu.json 全体"""
+    __slots__ = ("chains", "last_updated")
+
+    def __init__(self, chains: Iterable[Chain], last_updated: Optional[str] = None):
+        self.chains = list(chains)
+        self.last_updated = last_updated
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Menu":
+        if not isinstance(data, dict):
+            raise MenuValidationError("ルートがオブジェクトではありません")
+        chains = data.get("chains", [])
+        if not isinstance(chains, list):
+            raise MenuValidationError("chains が不正です")
+        return cls(
+            [Chain.from_dict(c, f"chains[{i}]") for i, c in enumerate(chains)],
+            data.get("last_updated"),
+        )
+
+    def to_dict(self) -> Dict:
+        data = {"chains": [c.to_dict() for c in self.chains]}
+        if self.last_updated is not None:
+            data["last_updated"] = self.last_updated
+        return data
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    """dict / モデルをUTF-8のJSONバイト列に変換（ensure_ascii=False 相当）"""
+    if hasattr(data, "to_dict"):
+        data = data.to_dict()
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+def loads(raw) -> Dict:
+    """JSONバイト列 / 文字列を dict に変換"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode("utf-8")
+    return json.loads(raw)
+
+
+def load_menu(path: str) -> Menu:
+    """JSONファイルを読み込み、検証済みの Menu を返す"""
+    with open(path, "rb") as f:
+        return Menu.from_dict(loads(f.read()))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+チェーンごとに分割したメニューストレージ
+- Resources/ChainsMenu/<chain_id>.json : チェーン単位のコンパクトなJSON（シャード）
+- Resources/ChainsMenu/manifest.json   : 各シャードのバージョン・ハッシュ・商品数
+- 書き込みは一時ファイル + os.replace によるアトミック置換
+- 内容が変わったシャードだけを書き換える
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional
+
+from menu_model import Chain, Menu, MenuValidationError, dumps, load_menu, loads
+
+DEFAULT_STORE_DIR = "Resources/ChainsMenu"
+MANIFEST_NAME = "manifest.json"
+
+_CHAIN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# mkstemp は 0600 で作成するため、新規ファイルは通常の open() と同じ 0666 & ~umask にする
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def chain_filename(chain_id: str) -> str:
+    """チェーンIDからファイル名を作る（パスとして危険なIDは拒否）"""
+    if not _CHAIN_ID_PATTERN.match(chain_id):
+        raise MenuValidationError(f"ファイル名に使えないチェーンIDです: {chain_id!r}")
+    return f"{chain_id}.json"
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    同じディレクトリの一時ファイルに書いてから置換する（途中状態を残さない）
+    既存ファイルのパーミッションは引き継ぐ
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def merge_chain_bytes(chains: Iterable[bytes], last_updated: Optional[str], version: int) -> bytes:
+    """チェーンのJSONバイト列を連結して ChainsMenu.json 形式にする"""
+    parts = [b'{"chains":[', b",".join(chains), b"]"]
+    if last_updated is not None:
+        parts.append(b',"last_updated":' + dumps(last_updated))
+    parts.append(b',"version":' + dumps(version))
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+class MenuStore:
+    """マニフェスト付きのチェーン別シャードストア"""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._manifest: Optional[Dict] = None
+
+    # --- マニフェスト ---
+
+    @property
+    def manifest(self) -> Dict:
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, "rb") as f:
+                    self._manifest = loads(f.read())
+            except FileNotFoundError:
+                self._manifest = {"version": 0, "last_updated": None, "chains": {}}
+        return self._manifest
+
+    def reload(self):
+        """他プロセス・他インスタンスが更新したマニフェストを読み直す"""
+        self._manifest = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def chain_ids(self) -> List[str]:
+        return list(self.manifest["chains"].keys())
+
+    def _shard_path(self, chain_id: str) -> str:
+        return os.path.join(self.root, chain_filename(chain_id))
+
+    def _save_manifest(self):
+        atomic_write(self.manifest_path, dumps(self.manifest, indent=True))
+
+    # --- 読み込み ---
+
+    def read_raw(self, chain_id: str) -> bytes:
+        """シャードのJSONバイト列をそのまま返す（パースしない）"""
+        with open(self._shard_path(chain_id), "rb") as f:
+            return f.read()
+
+    def read_chain(self, chain_id: str) -> Chain:
+        return Chain.from_dict(loads(self.read_raw(chain_id)))
+
+    def read_menu(self, chain_ids: Optional[Iterable[str]] = None) -> Menu:
+        """指定チェーン（省略時は全チェーン）を読み込んで Menu を返す"""
+        ids = self.chain_ids() if chain_ids is None else list(chain_ids)
+        return Menu([self.read_chain(cid) for cid in ids], self.manifest.get("last_updated"))
+
+    # --- 書き込み ---
+
+    def write_chains(self, chains: Iterable[Chain]) -> List[str]:
+        """
+        チェーンを書き込み、実際に内容が変わったチェーンIDのリストを返す
+        変更がなければシャードもマニフェストも書き換えない
+        """
+        entries = self.manifest["chains"]
+        changed = []
+        for chain in chains:
+            raw = dumps(chain)
+            digest = hashlib.sha256(raw).hexdigest()
+            entry = entries.get(chain.id)
+            if entry and entry["sha256"] == digest:
+                continue
+            atomic_write(self._shard_path(chain.id), raw)
+            entries[chain.id] = {
+                "file": chain_filename(chain.id),
+                "version": (entry["version"] + 1) if entry else 1,
+                "sha256": digest,
+                "bytes": len(raw),
+                "products": chain.product_count(),
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            changed.append(chain.id)
+
+        if changed:
+            self.manifest["version"] += 1
+            self.manifest["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save_manifest()
+        return changed
+
+    # --- 統合ファイルとの相互変換 ---
+
+    def import_monolith(self, json_path: str) -> List[str]:
+        """従来の ChainsMenu.json からシャードを作成（初回移行用）"""
+        menu = load_menu(json_path)
+        changed = self.write_chains(menu.chains)
+        if changed and menu.last_updated:
+            self.manifest["last_updated"] = menu.last_updated
+            self._save_manifest()
+        return changed
+
+    def merged_bytes(self) -> bytes:
+        """
+        全チェーンを統合した ChainsMenu.json 形式のバイト列
+        シャードのバイト列を連結するだけなので再パース・再シリアライズしない
+        "version" はマニフェストのバージョン（クライアントが差分パッチの起点に使う）
+        """
+        return merge_chain_bytes((self.read_raw(cid) for cid in self.chain_ids()),
+                                 self.manifest.get("last_updated"), self.manifest["version"])
+
+    def export_merged(self, json_path: str):
+        """
+        アプリ同梱用の ChainsMenu.json を書き出す
+        リポジトリで差分を追えるよう従来どおりインデント付き（シャードが変わったときだけ呼ばれる）
+        """
+        atomic_write(json_path, dumps(loads(self.merged_bytes()), indent=True))
+
+
+def open_store(json_path: str, root: str = DEFAULT_STORE_DIR) -> MenuStore:
+    """ストアを開く。未作成なら既存の ChainsMenu.json から移行する"""
+    store = MenuStore(root)
+    if not store.exists() and os.path.exists(json_path):
+        migrated = store.import_monolith(json_path)
+        print(f"📦 {json_path} から {len(migrated)}チェーンをシャードに移行しました")
+    return store
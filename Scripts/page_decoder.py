@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+HTMLレスポンスの文字コード判定とデコード
+国内チェーンのサイトは UTF-8 / Shift_JIS / EUC-JP が混在し、宣言が誤っていることもあるため
+以下の順に候補を試し、厳密にデコードできた最初の文字コードで1度だけテキストにする
+1. BOM
+2. UTF-8（日本語の CP932 / EUC-JP が偶然 UTF-8 として正しいことはまずないため、宣言より優先）
+3. Content-Type ヘッダーの charset
+4. <meta charset> / <meta http-equiv="Content-Type"> （先頭 4KB のみ走査）
+5. 前回そのホストで判定した文字コード（宣言がない場合のみ。簡易判定を省略する）
+6. 簡易判定（CP932 / EUC-JP をひらがなの割合で比較 → charset_normalizer）
+CP932 は EUC-JP や多くの UTF-8 のバイト列もエラーなくデコードしてしまうため、
+前回の結果を正しい宣言より優先すると文字化けがホストに定着する
+ISO-8859-1 などの宣言は日本語ページではサーバーの既定値であることが多く、常にデコードできてしまうため使わない
+判定結果はホストごとに .cache/scraper/encodings.json に保存する
+"""
+import codecs
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from menu_model import dumps, loads
+from menu_store import atomic_write
+from fetch_resilience import DEFAULT_CACHE_DIR
+
+try:
+    import charset_normalizer
+except ImportError:  # charset_normalizer は任意依存（requests と一緒に入っていることが多い）
+    charset_normalizer = None
+
+_META_SCAN_BYTES = 4096
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_HIRAGANA = re.compile(r"[ぁ-ゖ]")
+_BOMS = [
+    (codecs.BOM_UTF8, "utf_8_sig"),
+    (codecs.BOM_UTF16_LE, "utf_16"),
+    (codecs.BOM_UTF16_BE, "utf_16"),
+]
+# 宣言名の揺れを Python のコーデック名に寄せる（Shift_JIS は機種依存文字を含む CP932 として扱う）
+_ALIASES = {
+    "shift_jis": "cp932", "shift-jis": "cp932", "sjis": "cp932", "x-sjis": "cp932",
+    "windows-31j": "cp932", "ms_kanji": "cp932", "csshiftjis": "cp932",
+    "euc-jp": "euc_jp", "x-euc-jp": "euc_jp", "eucjp": "euc_jp",
+}
+# 常にデコードに成功してしまうため、宣言されていても信用しない文字コード
+_UNTRUSTED = {"iso8859_1", "cp1252", "ascii"}
+_JAPANESE_CANDIDATES = ["cp932", "euc_jp"]
+
+
+def normalize_charset(name: Optional[str]) -> Optional[str]:
+    """宣言された charset を Python のコーデック名に変換（不明なら None）"""
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = _ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name.replace("-", "_")
+    except LookupError:
+        return None
+
+
+def charset_from_bom(raw: bytes) -> Optional[str]:
+    for bom, encoding in _BOMS:
+        if raw.startswith(bom):
+            return encoding
+    return None
+
+
+def charset_from_header(content_type: Optional[str]) -> Optional[str]:
+    m = _HEADER_CHARSET.search(content_type or "")
+    return normalize_charset(m.group(1)) if m else None
+
+
+def charset_from_meta(raw: bytes) -> Optional[str]:
+    m = _META_CHARSET.search(raw[:_META_SCAN_BYTES])
+    return normalize_charset(m.group(1).decode("ascii", "ignore")) if m else None
+
+
+def _decodes(raw: bytes, encoding: str) -> Optional[str]:
+    try:
+        return raw.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
+
+
+def detect_charset(raw: bytes) -> Optional[Tuple[str, str]]:
+    """宣言がない・誤っている場合の簡易判定。(文字コード, デコード結果) を返す"""
+    # 正しい文字コードでは助詞などのひらがなが多く、誤ると無関係な漢字・記号になる
+    scored = []
+    for encoding in _JAPANESE_CANDIDATES:
+        text = _decodes(raw, encoding)
+        if text is not None:
+            scored.append((len(_HIRAGANA.findall(text)), encoding, text))
+    if scored:
+        _, encoding, text = max(scored, key=lambda item: item[0])
+        return encoding, text
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(raw).best()
+        encoding = normalize_charset(best.encoding) if best is not None else None
+        text = _decodes(raw, encoding) if encoding else None
+        if text is not None:
+            return encoding, text
+    return None
+
+
+class PageDecoder:
+    """レスポンス本文を1度だけテキストにデコードし、判定した文字コードをホストごとに記憶する"""
+
+    def __init__(self, state_path: Optional[str] = os.path.join(DEFAULT_CACHE_DIR, "encodings.json")):
+        self.state_path = state_path
+        self._hosts: Optional[Dict[str, str]] = None
+
+    @property
+    def hosts(self) -> Dict[str, str]:
+        if self._hosts is None:
+            self._hosts = {}
+            if self.state_path:
+                try:
+                    with open(self.state_path, "rb") as f:
+                        self._hosts = loads(f.read())
+                except FileNotFoundError:
+                    pass
+        return self._hosts
+
+    def _remember(self, host: str, encoding: str):
+        if self.hosts.get(host) != encoding:
+            self.hosts[host] = encoding
+            if self.state_path:
+                atomic_write(self.state_path, dumps(self.hosts, indent=True))
+
+    def candidates(self, host: str, raw: bytes, content_type: Optional[str]) -> List[str]:
+        """試す順の文字コード（重複・信用しない宣言を除く）"""
+        declared = [encoding for encoding in (charset_from_header(content_type), charset_from_meta(raw))
+                    if encoding and encoding not in _UNTRUSTED]
+        # 前回の結果は宣言がないときだけ簡易判定の代わりに使う
+        ordered = [charset_from_bom(raw), "utf_8", *declared]
+        if not declared:
+            ordered.append(self.hosts.get(host))
+        result = []
+        for encoding in ordered:
+            if encoding and encoding not in _UNTRUSTED and encoding not in result:
+                result.append(encoding)
+        return result
+
+    def decode(self, url: str, raw: bytes, content_type: Optional[str] = None) -> str:
+        host = urlparse(url).hostname or url
+        for encoding in self.candidates(host, raw, content_type):
+            text = _decodes(raw, encoding)
+            if text is not None:
+                self._remember(host, encoding)
+                return text
+
+        detected = detect_charset(raw)
+        if detected is not None:
+            encoding, text = detected
+            self._remember(host, encoding)
+            return text
+        # どれでも厳密にはデコードできない場合は UTF-8 で置換文字を許容
+        return raw.decode("utf-8", errors="replace")
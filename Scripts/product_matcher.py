@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+商品名の同一性判定
+- 日本語向けの正規化（NFKC、カタカナ→ひらがな、空白・記号・商標記号の除去）
+- 正規化後の文字 n-gram による転置インデックスで候補を絞り込み、Dice係数で照合
+- 上位候補が拮抗する場合は曖昧として報告する
+- 英数字の添字や温度などの種別だけが異なる名前（ミラノサンドA / ミラノサンドC）は別商品とみなす
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 商標記号（NFKC で "TM" などに展開されるため正規化前に除去）
+_TRADEMARKS = re.compile(r"[™®©℠]")
+# 空白・区切り記号など、商品の同一性に関係しない文字（NFKC 後に除去）
+_IGNORED_CHARS = re.compile(r"[\s・·.,、。!?'\"‘’“”「」『』()\[\]【】〈〉<>/\-–—~〜]+")
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+# 正規化後の名前の差分がこれを含むと別商品（添字・サイズ・号数など）
+_ALNUM = re.compile(r"[0-9a-z]")
+# 差分がこれだけなら別商品（正規化後の表記）
+_VARIANT_MARKERS = {"ほっと", "あいす", "ていくあうと", "大", "小", "新", "旧", "限定"}
+
+
+def normalize_name(name: str) -> str:
+    """表記ゆれを吸収した比較用の商品名"""
+    text = unicodedata.normalize("NFKC", _TRADEMARKS.sub("", name))
+    text = text.translate(_KATAKANA_TO_HIRAGANA).lower()
+    return _IGNORED_CHARS.sub("", text)
+
+
+def is_variant(a: str, b: str) -> bool:
+    """
+    正規化済みの2つの名前が、共通部分を除いた差分で別商品と判断できるか
+    差分に英数字を含む、または差分が種別の表記（ほっと / あいす など）そのものなら True
+    """
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(a), len(b)) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    residues = (a[prefix:len(a) - suffix], b[prefix:len(b) - suffix])
+    return any(_ALNUM.search(r) or r in _VARIANT_MARKERS for r in residues if r)
+
+
+def ngrams(text: str, n: int = 2) -> Set[str]:
+    """文字 n-gram の集合（n 文字未満ならその文字列自体）"""
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class MatchResult:
+    """照合結果"""
+    __slots__ = ("product_id", "score", "candidates")
+
+    def __init__(self, product_id: Optional[int], score: float,
+                 candidates: List[Tuple[int, str, float]]):
+        self.product_id = product_id
+        self.score = score
+        # (商品ID, 既存の商品名, スコア) の上位候補
+        self.candidates = candidates
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.product_id is None and len(self.candidates) > 1
+
+
+class ProductMatcher:
+    """
+    既存商品の名前を n-gram 転置インデックスに登録し、新しい商品名を既存IDに対応付ける
+    候補の列挙は共通 n-gram を持つ商品だけを辿るため、商品数全体には比例しない
+    """
+
+    def __init__(self, n: int = 2, threshold: float = 0.8, margin: float = 0.05):
+        self.n = n
+        self.threshold = threshold
+        self.margin = margin
+        self._names: Dict[int, str] = {}
+        self._normalized: Dict[int, str] = {}
+        self._grams: Dict[int, Set[str]] = {}
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._index: Dict[str, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, product_id: int, name: str):
+        normalized = normalize_name(name)
+        grams = ngrams(normalized, self.n)
+        self._names[product_id] = name
+        self._normalized[product_id] = normalized
+        self._grams[product_id] = grams
+        self._exact[normalized].append(product_id)
+        for gram in grams:
+            self._index[gram].add(product_id)
+
+    def add_all(self, products: Iterable[Tuple[int, str]]):
+        for product_id, name in products:
+            self.add(product_id, name)
+
+    def exact_ids(self, name: str, exclude: Iterable[int] = ()) -> List[int]:
+        """正規化後の名前が一致する既存商品ID（小さい順。先頭を正とし、残りは重複行）"""
+        excluded = set(exclude)
+        return sorted(pid for pid in self._exact.get(normalize_name(name), ()) if pid not in excluded)
+
+    def match(self, name: str, exclude: Iterable[int] = ()) -> MatchResult:
+        """
+        name に対応する既存商品IDを探す
+        exclude（同じ実行で既に対応付けたID）は候補から除く
+        正規化後の名前が一致する既存商品が複数あれば最小のIDを返す
+        """
+        excluded = set(exclude)
+        normalized = normalize_name(name)
+
+        exact = self.exact_ids(name, excluded)
+        if exact:
+            return MatchResult(exact[0], 1.0, [(pid, self._names[pid], 1.0) for pid in exact])
+
+        grams = ngrams(normalized, self.n)
+        if not grams:
+            return MatchResult(None, 0.0, [])
+
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for pid in self._index.get(gram, ()):
+                if pid not in excluded:
+                    shared[pid] += 1
+
+        scored = sorted(
+            ((pid, 2 * count / (len(grams) + len(self._grams[pid])))
+             for pid, count in shared.items()
+             if not is_variant(normalized, self._normalized[pid])),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        if not scored or scored[0][1] < self.threshold:
+            return MatchResult(None, scored[0][1] if scored else 0.0, [])
+
+        best_id, best_score = scored[0]
+        rivals = [(pid, score) for pid, score in scored[1:] if best_score - score < self.margin]
+        candidates = [(pid, self._names[pid], score) for pid, score in [scored[0]] + rivals]
+        if rivals:
+            return MatchResult(None, best_score, candidates)
+        return MatchResult(best_id, best_score, candidates)
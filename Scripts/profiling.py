@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+スクレイパー・インポーターのプロファイリング（--profile 指定時のみ有効）
+ステージごとに以下を出力する
+- <stage>.pstats      : cProfile の統計（snakeviz / pstats で閲覧）
+- <stage>.txt         : 累積時間上位の関数と tracemalloc のピーク・確保箇所上位
+- <stage>.collapsed   : スタックサンプル（flamegraph.pl / speedscope 用、--profile-stacks 時）
+- summary.json        : 各ステージの実時間・CPU時間・ピークメモリ
+CPU時間 / 実時間 が小さいステージは I/O 待ち、ピークメモリが大きいステージは確保が多い
+（--profile-stacks 時のピークにはサンプラー自身の確保も含まれる）
+"""
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from menu_model import dumps
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class StackSampler(threading.Thread):
+    """対象スレッドのスタックを一定間隔で採取し、collapsed 形式で集計する"""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """ステージ単位で cProfile / tracemalloc / スタックサンプリングを行う"""
+
+    def __init__(self, output_dir: Optional[str] = None, stacks: bool = False,
+                 top: int = 25):
+        self.output_dir = output_dir
+        self.stacks = stacks
+        self.top = top
+        self.results: List[Dict] = []
+        self._collapsed: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.output_dir, f"{_UNSAFE_CHARS.sub('_', name)}{suffix}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """with profiler.stage("starbucks"): ... の範囲を計測（ネスト不可）"""
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        sampler = StackSampler(threading.get_ident()) if self.stacks else None
+        profile = cProfile.Profile()
+
+        tracemalloc.start()
+        if sampler:
+            sampler.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            if sampler:
+                sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+            self._write_stage(name, profile, snapshot, sampler, wall, cpu, peak)
+
+    def _write_stage(self, name: str, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot,
+                     sampler: Optional[StackSampler], wall: float, cpu: float, peak: int):
+        profile.dump_stats(self._path(name, ".pstats"))
+
+        report = io.StringIO()
+        report.write(f"# {name}\n")
+        report.write(f"wall: {wall:.3f}s  cpu: {cpu:.3f}s  peak: {peak / 1024:.1f} KiB\n\n")
+        pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+        report.write("\n# tracemalloc: 確保量上位\n")
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            report.write(f"{stat}\n")
+        with open(self._path(name, ".txt"), "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+
+        if sampler:
+            with open(self._path(name, ".collapsed"), "w", encoding="utf-8") as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            for stack, count in sampler.stacks.items():
+                self._collapsed[f"{name};{stack}"] += count
+
+        self.results.append({
+            "stage": name,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "cpu_ratio": round(cpu / wall, 3) if wall > 0 else None,
+            "peak_bytes": peak,
+        })
+
+    def write_summary(self):
+        """全ステージのまとめを書き出して表示"""
+        if not self.enabled or not self.results:
+            return
+        with open(os.path.join(self.output_dir, "summary.json"), "wb") as f:
+            f.write(dumps(self.results, indent=True))
+        if self._collapsed:
+            with open(os.path.join(self.output_dir, "all.collapsed"), "w", encoding="utf-8") as f:
+                for stack, count in self._collapsed.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        print(f"\n⏱️ プロファイル結果（{self.output_dir}）")
+        print(f"  {'stage':<24}{'wall(s)':>10}{'cpu(s)':>10}{'cpu%':>7}{'peak(KiB)':>12}")
+        for r in self.results:
+            ratio = f"{r['cpu_ratio']:.0%}" if r["cpu_ratio"] is not None else "-"
+            print(f"  {r['stage']:<24}{r['wall_seconds']:>10.3f}{r['cpu_seconds']:>10.3f}"
+                  f"{ratio:>7}{r['peak_bytes'] / 1024:>12.1f}")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """--profile / --profile-stacks をエントリーポイントに追加"""
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                        help="ステージごとに cProfile / tracemalloc の結果を出力"
+                             "（DIR 省略時は .cache/profile/<実行名>-<日時>）")
+    parser.add_argument("--profile-stacks", action="store_true",
+                        help="フレームグラフ用の collapsed スタックも出力")
+
+
+def profiler_from_args(args: argparse.Namespace, run_name: str) -> Profiler:
+    if args.profile is None:
+        return Profiler()
+    output_dir = args.profile or os.path.join(
+        ".cache/profile", f"{run_name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    return Profiler(output_dir, stacks=args.profile_stacks)
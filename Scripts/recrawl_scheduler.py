@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+変更頻度に基づく再クロールスケジューラ
+- チェーンごとにクロール間隔と「変更があったか」の履歴を記録
+- 履歴から変更率 λ（回/秒）を推定し、前回クロールからの経過時間で
+  「すでに変わっている確率」= 1 - exp(-λ·t) を期待陳腐度とする
+- 陳腐度が閾値を超えたチェーンだけを、時間・リクエスト数の予算内で選ぶ
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from menu_model import dumps, loads
+from menu_store import atomic_write
+from fetch_resilience import DEFAULT_CACHE_DIR
+
+WEEK = 7 * 24 * 3600
+
+
+@dataclass
+class CrawlPlan:
+    """スケジューラが選んだクロール対象"""
+    chain_id: str
+    staleness: float
+    est_seconds: float
+    est_requests: float
+
+
+class RecrawlScheduler:
+    """
+    変更率の推定には Cho & Garcia-Molina の推定量
+    λ = -ln((n - X + 0.5) / (n + 0.5)) / 平均間隔
+    を使う（n: 観測した間隔の数、X: そのうち変更があった数）
+    1回の間隔で複数回変わっても1回としか観測できない偏りを補正する
+    """
+
+    def __init__(self, state_path: str = os.path.join(DEFAULT_CACHE_DIR, "recrawl_history.json"),
+                 threshold: float = 0.5,
+                 default_rate: float = 1 / WEEK,
+                 max_interval: float = 4 * WEEK,
+                 min_observations: int = 3,
+                 window: int = 20,
+                 clock: Callable[[], float] = time.time):
+        self.state_path = state_path
+        self.threshold = threshold
+        self.default_rate = default_rate
+        self.max_interval = max_interval
+        self.min_observations = min_observations
+        self.window = window
+        self.clock = clock
+        try:
+            with open(state_path, "rb") as f:
+                self.history: Dict[str, Dict] = loads(f.read())
+        except FileNotFoundError:
+            self.history = {}
+
+    def save(self):
+        atomic_write(self.state_path, dumps(self.history, indent=True))
+
+    # --- 推定 ---
+
+    def change_rate(self, chain_id: str) -> float:
+        """変更率 λ（回/秒）の推定値。観測が少なければ既定値"""
+        observations = self.history.get(chain_id, {}).get("observations", [])
+        n = len(observations)
+        if n < self.min_observations:
+            return self.default_rate
+        changes = sum(1 for _, changed in observations if changed)
+        mean_interval = sum(interval for interval, _ in observations) / n
+        if mean_interval <= 0:
+            return self.default_rate
+        return -math.log((n - changes + 0.5) / (n + 0.5)) / mean_interval
+
+    def staleness(self, chain_id: str) -> float:
+        """前回クロール以降に変更されている確率（未クロールなら 1.0）"""
+        entry = self.history.get(chain_id)
+        if not entry or entry.get("last_crawl") is None:
+            return 1.0
+        elapsed = self.clock() - entry["last_crawl"]
+        if elapsed >= self.max_interval:
+            return 1.0
+        return 1.0 - math.exp(-self.change_rate(chain_id) * elapsed)
+
+    # --- 計画 ---
+
+    def plan(self, chain_ids: Iterable[str],
+             time_budget: Optional[float] = None,
+             request_budget: Optional[float] = None) -> List[CrawlPlan]:
+        """
+        陳腐度が閾値以上のチェーンを陳腐度の高い順に選ぶ
+        予算を超えるチェーンは飛ばし、より安いチェーンで残りの予算を埋める
+        """
+        candidates = []
+        for chain_id in chain_ids:
+            staleness = self.staleness(chain_id)
+            if staleness < self.threshold:
+                continue
+            entry = self.history.get(chain_id, {})
+            candidates.append(CrawlPlan(
+                chain_id,
+                staleness,
+                entry.get("avg_seconds", 5.0),
+                entry.get("avg_requests", 1.0),
+            ))
+        candidates.sort(key=lambda p: p.staleness, reverse=True)
+
+        selected = []
+        time_left = math.inf if time_budget is None else time_budget
+        requests_left = math.inf if request_budget is None else request_budget
+        for plan in candidates:
+            if plan.est_seconds > time_left or plan.est_requests > requests_left:
+                continue
+            time_left -= plan.est_seconds
+            requests_left -= plan.est_requests
+            selected.append(plan)
+        return selected
+
+    # --- 記録 ---
+
+    def record(self, chain_id: str, changed: bool, seconds: float, requests: int):
+        """クロール結果を記録（取得に失敗した場合は呼ばない）"""
+        now = self.clock()
+        entry = self.history.setdefault(chain_id, {"observations": []})
+        if entry.get("last_crawl") is not None:
+            entry["observations"].append([now - entry["last_crawl"], changed])
+            del entry["observations"][:-self.window]
+        entry["last_crawl"] = now
+        if changed:
+            entry["last_change"] = now
+        # 所要時間・リクエスト数は指数移動平均で保持
+        entry["avg_seconds"] = _ema(entry.get("avg_seconds"), seconds)
+        entry["avg_requests"] = _ema(entry.get("avg_requests"), max(requests, 1))
+
+
+def _ema(previous: Optional[float], value: float, alpha: float = 0.3) -> float:
+    return value if previous is None else previous + alpha * (value - previous)
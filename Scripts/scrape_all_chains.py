@@ -12,38 +12,80 @@
 - カフェ・ド・クリエ
 - プロント
 """
-import json
+import argparse
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 import requests
 from bs4 import BeautifulSoup
 
+from menu_model import Chain
+from menu_store import DEFAULT_STORE_DIR, open_store
+from menu_delta import DeltaPublisher
+from fetch_resilience import CircuitBreaker, LastKnownGoodCache
+from recrawl_scheduler import RecrawlScheduler
+from sitemap_index import SitemapIndex
+from page_decoder import PageDecoder
+from profiling import Profiler, add_profile_arguments, profiler_from_args
+
 
 class CafeScraper:
     """カフェチェーンのスクレイパー基底クラス"""
     
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'CafeDokoBot/1.0 (+https://cafedoko.app/bot)',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3'
-        }
+    chain_id = ""
+    chain_name = ""
+    # サイトマップで更新を確認するメニューページ（すべて未更新なら取得をスキップ）
+    # 現在の10社のスクレイパーはページを取得していないため未設定。fetch_page で実ページを
+    # 取得するようにしたチェーンから設定する（サイトマップ判定は現状 scrape_starbucks.py のみ）
+    sitemap_url: Optional[str] = None
+    menu_urls: List[str] = []
+    
+    DEFAULT_HEADERS = {
+        'User-Agent': 'CafeDokoBot/1.0 (+https://cafedoko.app/bot)',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3'
+    }
+    
+    def __init__(self, breaker: Optional[CircuitBreaker] = None,
+                 session: Optional[requests.Session] = None,
+                 decoder: Optional[PageDecoder] = None):
+        self.breaker = breaker
+        # デーモンなど長時間動かす場合はセッションを共有して接続を再利用
+        self.session = session
+        # 文字コードの判定結果はホストごとに記憶（スクレイパー間で共有）
+        self.decoder = decoder or PageDecoder()
+        self.request_count = 0
+        self.headers = dict(self.DEFAULT_HEADERS)
     
     def fetch_page(self, url: str, timeout: int = 10) -> BeautifulSoup:
         """ページを取得してBeautifulSoupオブジェクトを返す"""
-        response = requests.get(url, headers=self.headers, timeout=timeout)
-        response.raise_for_status()
-        return BeautifulSoup(response.content, 'html.parser')
+        def get():
+            self.request_count += 1
+            response = (self.session or requests).get(url, headers=self.headers, timeout=timeout)
+            response.raise_for_status()
+            return response
+        
+        # 連続失敗中のホストはタイムアウトを待たずに CircuitOpenError で即失敗
+        response = self.breaker.call(url, get) if self.breaker else get()
+        # 文字コードを判定して1度だけデコードし、BeautifulSoup にはテキストを渡す
+        text = self.decoder.decode(url, response.content, response.headers.get('Content-Type'))
+        return BeautifulSoup(text, 'html.parser')
     
     def extract_price(self, text: str) -> int:
         """テキストから価格（数値）を抽出"""
         digits = ''.join(filter(str.isdigit, text))
         return int(digits) if digits else 0
+    
+    def _format_data(self, products: List[Dict]) -> Dict:
+        """商品リストを検証し、カテゴリー別のチェーンデータに整形"""
+        return Chain.from_products(self.chain_id, self.chain_name, products).to_dict()
 
 
 class StarbucksScraper(CafeScraper):
     """スターバックス スクレイパー"""
     
+    chain_id = "starbucks"
+    chain_name = "スターバックス"
+    
     def scrape(self) -> Dict:
         print("🔍 スターバックスメニューを取得中...")
         
@@ -71,29 +113,15 @@ class StarbucksScraper(CafeScraper):
         ]
         
         print(f"✅ スターバックス: {len(products)}商品")
-        return self._format_data("starbucks", "スターバックス", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class DoutorScraper(CafeScraper):
     """ドトール スクレイパー"""
     
+    chain_id = "doutor"
+    chain_name = "ドトール"
+    
     def scrape(self) -> Dict:
         print("🔍 ドトールメニューを取得中...")
         
@@ -119,29 +147,15 @@ class DoutorScraper(CafeScraper):
         ]
         
         print(f"✅ ドトール: {len(products)}商品")
-        return self._format_data("doutor", "ドトール", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class TullysScraper(CafeScraper):
     """タリーズ スクレイパー"""
     
+    chain_id = "tullys"
+    chain_name = "タリーズ"
+    
     def scrape(self) -> Dict:
         print("🔍 タリーズメニューを取得中...")
         
@@ -168,29 +182,15 @@ class TullysScraper(CafeScraper):
         ]
         
         print(f"✅ タリーズ: {len(products)}商品")
-        return self._format_data("tullys", "タリーズ", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class KomedaScraper(CafeScraper):
     """コメダ珈琲 スクレイパー"""
     
+    chain_id = "komeda"
+    chain_name = "コメダ珈琲"
+    
     def scrape(self) -> Dict:
         print("🔍 コメダ珈琲メニューを取得中...")
         
@@ -219,29 +219,15 @@ class KomedaScraper(CafeScraper):
         ]
         
         print(f"✅ コメダ珈琲: {len(products)}商品")
-        return self._format_data("komeda", "コメダ珈琲", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class ExcelsiorScraper(CafeScraper):
     """エクセルシオール スクレイパー"""
     
+    chain_id = "excelsior"
+    chain_name = "エクセルシオール"
+    
     def scrape(self) -> Dict:
         print("🔍 エクセルシオールメニューを取得中...")
         
@@ -271,29 +257,15 @@ class ExcelsiorScraper(CafeScraper):
         ]
         
         print(f"✅ エクセルシオール: {len(products)}商品")
-        return self._format_data("excelsior", "エクセルシオール", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class SaintMarcScraper(CafeScraper):
     """サンマルクカフェ スクレイパー"""
     
+    chain_id = "saintmarc"
+    chain_name = "サンマルクカフェ"
+    
     def scrape(self) -> Dict:
         print("🔍 サンマルクカフェメニューを取得中...")
         
@@ -322,29 +294,15 @@ class SaintMarcScraper(CafeScraper):
         ]
         
         print(f"✅ サンマルクカフェ: {len(products)}商品")
-        return self._format_data("saintmarc", "サンマルクカフェ", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class VeloceScraper(CafeScraper):
     """カフェ・ベローチェ スクレイパー"""
     
+    chain_id = "veloce"
+    chain_name = "カフェ・ベローチェ"
+    
     def scrape(self) -> Dict:
         print("🔍 カフェ・ベローチェメニューを取得中...")
         
@@ -373,29 +331,15 @@ class VeloceScraper(CafeScraper):
         ]
         
         print(f"✅ カフェ・ベローチェ: {len(products)}商品")
-        return self._format_data("veloce", "カフェ・ベローチェ", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class UeshimaScraper(CafeScraper):
     """上島珈琲店 スクレイパー"""
     
+    chain_id = "ueshima"
+    chain_name = "上島珈琲店"
+    
     def scrape(self) -> Dict:
         print("🔍 上島珈琲店メニューを取得中...")
         
@@ -427,29 +371,15 @@ class UeshimaScraper(CafeScraper):
         ]
         
         print(f"✅ 上島珈琲店: {len(products)}商品")
-        return self._format_data("ueshima", "上島珈琲店", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class CafeDeClieScraper(CafeScraper):
     """カフェ・ド・クリエ スクレイパー"""
     
+    chain_id = "cafedecrie"
+    chain_name = "カフェ・ド・クリエ"
+    
     def scrape(self) -> Dict:
         print("🔍 カフェ・ド・クリエメニューを取得中...")
         
@@ -483,29 +413,15 @@ class CafeDeClieScraper(CafeScraper):
         ]
         
         print(f"✅ カフェ・ド・クリエ: {len(products)}商品")
-        return self._format_data("cafedecrie", "カフェ・ド・クリエ", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
 class ProntoScraper(CafeScraper):
     """プロント スクレイパー"""
     
+    chain_id = "pronto"
+    chain_name = "プロント"
+    
     def scrape(self) -> Dict:
         print("🔍 プロントメニューを取得中...")
         
@@ -541,92 +457,160 @@ class ProntoScraper(CafeScraper):
         ]
         
         print(f"✅ プロント: {len(products)}商品")
-        return self._format_data("pronto", "プロント", products)
-    
-    def _format_data(self, chain_id: str, chain_name: str, products: List[Dict]) -> Dict:
-        categories = {}
-        for p in products:
-            cat = p["category"]
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(p)
-        
-        return {
-            "id": chain_id,
-            "name": chain_name,
-            "categories": [
-                {"name": cat, "products": prods}
-                for cat, prods in categories.items()
-            ]
-        }
+        return self._format_data(products)
 
 
-def update_chains_menu(chains_data: List[Dict]):
+def update_chains_menu(chains_data: List[Dict], json_path: str = "Resources/ChainsMenu.json",
+                       store_dir: str = DEFAULT_STORE_DIR) -> List[str]:
     """
-    ChainsMenu.jsonを更新
+    チェーン別シャードを更新し、変更があれば ChainsMenu.json を書き出す
+    内容が変わったチェーンIDのリストを返す
     """
-    json_path = "Resources/ChainsMenu.json"
-    
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"⚠️ {json_path} が見つかりません")
-        data = {"chains": []}
+    store = open_store(json_path, store_dir)
+    changed = store.write_chains(Chain.from_dict(c) for c in chains_data)
     
-    existing_chains = {chain.get("id"): chain for chain in data.get("chains", [])}
-    
-    # 新しいデータで更新
     for new_chain in chains_data:
-        chain_id = new_chain.get("id")
-        existing_chains[chain_id] = new_chain
-        print(f"✅ {new_chain['name']}を更新")
-    
-    data["chains"] = list(existing_chains.values())
-    data["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
-    
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        if new_chain["id"] in changed:
+            print(f"✅ {new_chain['name']}を更新")
+        else:
+            print(f"➖ {new_chain['name']}は変更なし")
+    
+    if changed:
+        store.export_merged(json_path)
+        print(f"💾 {json_path} を保存しました（{len(changed)}チェーン変更）")
+        index = DeltaPublisher(store).publish()
+        print(f"🧩 v{index['latest']} への差分パッチ {len(index['patches'])}件を生成")
+    else:
+        print("ℹ️ メニューに変更はありません")
     
-    print(f"💾 {json_path} を保存しました")
+    return changed
 
 
-def main():
-    print("=" * 60)
-    print("10大カフェチェーン メニュー自動更新")
-    print("=" * 60)
-    
-    scrapers = [
-        StarbucksScraper(),
-        DoutorScraper(),
-        TullysScraper(),
-        KomedaScraper(),
-        ExcelsiorScraper(),
-        SaintMarcScraper(),
-        VeloceScraper(),
-        UeshimaScraper(),
-        CafeDeClieScraper(),
-        ProntoScraper()
+def build_scrapers(breaker: Optional[CircuitBreaker] = None,
+                   session: Optional[requests.Session] = None,
+                   decoder: Optional[PageDecoder] = None) -> List[CafeScraper]:
+    """全チェーンのスクレイパーを生成（ブレーカー・HTTPセッション・文字コード判定は共有）"""
+    scraper_classes = [
+        StarbucksScraper,
+        DoutorScraper,
+        TullysScraper,
+        KomedaScraper,
+        ExcelsiorScraper,
+        SaintMarcScraper,
+        VeloceScraper,
+        UeshimaScraper,
+        CafeDeClieScraper,
+        ProntoScraper
     ]
+    decoder = decoder or PageDecoder()
+    return [cls(breaker, session, decoder) for cls in scraper_classes]
+
+
+def run_pipeline(scrapers: List[CafeScraper], scheduler: RecrawlScheduler,
+                 last_known_good: LastKnownGoodCache, sitemaps: SitemapIndex,
+                 profiler: Optional[Profiler] = None, crawl_all: bool = False,
+                 time_budget: Optional[float] = 600,
+                 request_budget: Optional[int] = 200) -> List[str]:
+    """
+    スケジューラが選んだチェーンを取得してストアを更新し、変更されたチェーンIDを返す
+    CLI とデーモン（menu_daemon.py）の両方から使う
+    """
+    profiler = profiler or Profiler()
+    
+    # 変更頻度から見て古くなっている可能性が高いチェーンだけを取得
+    if not crawl_all:
+        plans = scheduler.plan([s.chain_id for s in scrapers], time_budget, request_budget)
+        selected = {plan.chain_id for plan in plans}
+        for scraper in scrapers:
+            if scraper.chain_id not in selected:
+                staleness = scheduler.staleness(scraper.chain_id)
+                print(f"⏭️ {scraper.chain_name}: スキップ（陳腐度 {staleness:.0%}）")
+        scrapers = [s for s in scrapers if s.chain_id in selected]
     
     chains_data = []
+    crawled = {}
     
     for scraper in scrapers:
+        # サイトマップ上でメニューページの lastmod が進んでいなければ取得しない
+        if scraper.sitemap_url and scraper.menu_urls:
+            try:
+                sitemaps.refresh(scraper.sitemap_url)
+            except Exception as e:
+                print(f"  ⚠️ {scraper.chain_name}: サイトマップの取得に失敗: {e}")
+            else:
+                if sitemaps.all_unchanged(scraper.menu_urls):
+                    print(f"⏭️ {scraper.chain_name}: サイトマップ上で変更なし")
+                    crawled[scraper.chain_id] = (0.0, 1)
+                    continue
+        
         try:
-            data = scraper.scrape()
+            started = time.monotonic()
+            scraper.request_count = 0
+            with profiler.stage(scraper.chain_id):
+                data = scraper.scrape()
+            crawled[scraper.chain_id] = (time.monotonic() - started, scraper.request_count)
+            last_known_good.put(Chain.from_dict(data))
+            sitemaps.mark_crawled(scraper.menu_urls)
             chains_data.append(data)
             time.sleep(1)  # 各チェーン間で1秒待機
         except Exception as e:
             print(f"❌ エラー: {e}")
+            # 最終取得成功データが有効期限内ならそれを使う（なければ既存シャードを維持）
+            fallback = last_known_good.get(scraper.chain_id)
+            if fallback is not None:
+                print(f"  ↩️ {scraper.chain_name}: 前回取得データを使用")
+                chains_data.append(fallback.to_dict())
+            else:
+                print(f"  ⚠️ {scraper.chain_name}: 有効な前回取得データがないため更新をスキップ")
             continue
     
     if chains_data:
-        update_chains_menu(chains_data)
+        with profiler.stage("update"):
+            changed = update_chains_menu(chains_data)
         print(f"\n✨ {len(chains_data)}チェーンの更新完了！")
     else:
+        changed = []
         print("\n⚠️ データが取得できませんでした")
+    
+    # 取得に成功したチェーンだけ変更履歴に記録
+    for chain_id, (seconds, request_count) in crawled.items():
+        scheduler.record(chain_id, chain_id in changed, seconds, request_count)
+    scheduler.save()
+    sitemaps.save()
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="10大カフェチェーン メニュー自動更新")
+    parser.add_argument("--all", action="store_true",
+                        help="スケジューラを使わず全チェーンを取得")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="再クロールする期待陳腐度（変更済みの確率）の閾値")
+    parser.add_argument("--time-budget", type=float, default=600,
+                        help="1回の実行で使う推定取得時間の上限（秒）")
+    parser.add_argument("--request-budget", type=int, default=200,
+                        help="1回の実行で送る推定リクエスト数の上限")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, "scrape")
+    
+    print("=" * 60)
+    print("10大カフェチェーン メニュー自動更新")
+    print("=" * 60)
+    
+    breaker = CircuitBreaker()
+    run_pipeline(
+        build_scrapers(breaker),
+        RecrawlScheduler(threshold=args.threshold),
+        LastKnownGoodCache(),
+        SitemapIndex(CafeScraper.DEFAULT_HEADERS, breaker),
+        profiler,
+        crawl_all=args.all,
+        time_budget=args.time_budget,
+        request_budget=args.request_budget,
+    )
+    profiler.write_summary()
 
 
 if __name__ == "__main__":
     main()
-
@@ -2,16 +2,29 @@
 """
 スターバックス公式サイトから商品情報をスクレイピング
 """
-import json
+import argparse
 import time
 from typing import Dict, List, Optional
 import requests
 from bs4 import BeautifulSoup
 
-def scrape_starbucks_menu() -> Dict:
+from menu_model import Chain
+from menu_store import open_store
+from menu_delta import DeltaPublisher
+from fetch_resilience import CircuitBreaker, LastKnownGoodCache
+from sitemap_index import SitemapIndex
+from page_decoder import PageDecoder
+from profiling import add_profile_arguments, profiler_from_args
+
+def scrape_starbucks_menu(breaker: Optional[CircuitBreaker] = None,
+                          last_known_good: Optional[LastKnownGoodCache] = None,
+                          sitemaps: Optional[SitemapIndex] = None,
+                          decoder: Optional[PageDecoder] = None) -> Optional[Dict]:
     """
     スターバックスのメニュー情報を取得
     公式メニューページから価格とサイズを抽出
+    サイトマップの lastmod が前回取得時から進んでいないカテゴリー、取得に失敗したカテゴリーは前回データを再利用
+    前回データでも補えないカテゴリーがある場合は None（欠けたデータで既存のシャードを上書きしない）
     """
     print("🔍 スターバックスメニューを取得中...")
     
@@ -28,18 +41,45 @@ def scrape_starbucks_menu() -> Dict:
         "フード": f"{base_url}/4524785398173696"      # フード
     }
     
+    decoder = decoder or PageDecoder()
     products = []
+    crawled_urls = []
+    previous = last_known_good.get("starbucks") if last_known_good else None
+    previous_categories = {c.name: c for c in previous.categories} if previous else {}
+    previous_sizes = {p.name: p.sizes for p in previous.iter_products()} if previous else {}
+    missing = []
+    reused = []  # 取得に失敗し、前回取得データで補ったカテゴリー
+    reused_prices = []  # 価格が取得できず、前回取得データの価格で補った商品
+    
+    if sitemaps:
+        try:
+            sitemaps.refresh(f"{base_url}/sitemap.xml")
+        except Exception as e:
+            print(f"  ⚠️ サイトマップの取得に失敗: {e}")
     
     for category_name, category_url in categories.items():
+        if sitemaps and previous and sitemaps.is_unchanged(category_url):
+            previous_category = previous_categories.get(category_name)
+            if previous_category:
+                print(f"  ⏭️ {category_name}カテゴリーは変更なし（前回データを使用）")
+                products.extend(p.to_dict() for p in previous_category.products)
+                continue
+        
         try:
             print(f"  📄 {category_name}カテゴリーを取得中...")
-            response = requests.get(category_url, headers=headers, timeout=10)
-            response.raise_for_status()
+            def get():
+                response = requests.get(category_url, headers=headers, timeout=10)
+                response.raise_for_status()
+                return response
+            
+            response = breaker.call(category_url, get) if breaker else get()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            text = decoder.decode(category_url, response.content, response.headers.get('Content-Type'))
+            soup = BeautifulSoup(text, 'html.parser')
             
             # 商品リストを取得（実際のHTML構造に応じて調整）
             items = soup.select('.product-item, .menu-item')
+            category_products = []
             
             for item in items[:5]:  # 各カテゴリーから最大5商品
                 try:
@@ -69,19 +109,16 @@ def scrape_starbucks_menu() -> Dict:
                                 "price": price_num
                             })
                     
-                    # 価格情報がない場合はデフォルト値
+                    # 価格が取れない場合は前回取得データの価格を使い、それもなければ商品ごと除外
+                    # （固定の価格で実データを上書きしない）
                     if not prices:
-                        if category_name == "ドリンク":
-                            prices = [
-                                {"size": "Short", "price": 390},
-                                {"size": "Tall", "price": 430},
-                                {"size": "Grande", "price": 470},
-                                {"size": "Venti", "price": 510}
-                            ]
-                        else:
-                            prices = [{"size": "M", "price": 400}]
+                        if product_name not in previous_sizes:
+                            print(f"    ⚠️ {product_name}: 価格が取得できないため除外")
+                            continue
+                        prices = [s.to_dict() for s in previous_sizes[product_name]]
+                        reused_prices.append(product_name)
                     
-                    products.append({
+                    category_products.append({
                         "name": product_name,
                         "category": category_name,
                         "sizes": prices
@@ -92,58 +129,36 @@ def scrape_starbucks_menu() -> Dict:
                     continue
             
             time.sleep(1)  # 次のリクエストまで待機
+            if not category_products:
+                raise ValueError("商品を1件も解析できませんでした")
+            products.extend(category_products)
+            crawled_urls.append(category_url)
             
         except Exception as e:
             print(f"  ❌ {category_name}カテゴリーの取得に失敗: {e}")
-            continue
-    
-    # データが取得できなかった場合のフォールバック
-    if not products:
-        print("  ℹ️ スクレイピング失敗、デフォルトデータを使用")
-        products = [
-            {
-                "name": "ドリップコーヒー",
-                "category": "ドリンク",
-                "sizes": [
-                    {"size": "Short", "price": 390},
-                    {"size": "Tall", "price": 430},
-                    {"size": "Grande", "price": 470},
-                    {"size": "Venti", "price": 510}
-                ]
-            },
-            {
-                "name": "カフェラテ",
-                "category": "ドリンク",
-                "sizes": [
-                    {"size": "Short", "price": 460},
-                    {"size": "Tall", "price": 505},
-                    {"size": "Grande", "price": 550},
-                    {"size": "Venti", "price": 595}
-                ]
-            },
-            {
-                "name": "キャラメルマキアート",
-                "category": "ドリンク",
-                "sizes": [
-                    {"size": "Short", "price": 490},
-                    {"size": "Tall", "price": 535},
-                    {"size": "Grande", "price": 580},
-                    {"size": "Venti", "price": 625}
-                ]
-            }
-        ]
-    
-    result = {
-        "id": "starbucks",
-        "name": "スターバックス",
-        "categories": [
-            {
-                "name": cat,
-                "products": [p for p in products if p["category"] == cat]
-            }
-            for cat in set(p["category"] for p in products)
-        ]
-    }
+            # 失敗したカテゴリーは最終取得成功データ（有効期限内）で補う
+            previous_category = previous_categories.get(category_name)
+            if previous_category:
+                print(f"  ↩️ {category_name}カテゴリーは前回取得データを使用")
+                products.extend(p.to_dict() for p in previous_category.products)
+                reused.append(category_name)
+            else:
+                missing.append(category_name)
+    
+    if missing:
+        print(f"  ⚠️ {'、'.join(missing)}カテゴリーを取得できず、有効な前回取得データもありません")
+        return None
+    
+    # カテゴリーは出現順（set を使うと実行ごとに順序が変わり、内容が同じでもシャードが更新される）
+    chain = Chain.from_products("starbucks", "スターバックス", products)
+    result = chain.to_dict()
+    
+    # 失敗を前回データで補った場合は保存しない（古いデータ・価格の有効期限を延ばさない）
+    if last_known_good and not reused and not reused_prices:
+        last_known_good.put(chain)
+    if sitemaps:
+        sitemaps.mark_crawled(crawled_urls)
+        sitemaps.save()
     
     print(f"✅ スターバックス: {len(products)}商品を取得")
     return result
@@ -151,47 +166,52 @@ def scrape_starbucks_menu() -> Dict:
 
 def update_chains_menu(new_chain_data: Dict):
     """
-    ChainsMenu.jsonを更新
+    スターバックスのシャードを更新し、変更があれば ChainsMenu.json を書き出す
     """
     json_path = "Resources/ChainsMenu.json"
     
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"⚠️ {json_path} が見つかりません")
-        data = {"chains": []}
-    
-    chains = data.get("chains", [])
-    updated = False
-    
-    for i, chain in enumerate(chains):
-        if chain.get("id") == new_chain_data.get("id"):
-            chains[i] = new_chain_data
-            updated = True
-            print(f"✅ {new_chain_data['name']}の情報を更新しました")
-            break
-    
-    if not updated:
-        chains.append(new_chain_data)
-        print(f"✅ {new_chain_data['name']}を新規追加しました")
+    store = open_store(json_path)
+    is_new = new_chain_data.get("id") not in store.chain_ids()
+    changed = store.write_chains([Chain.from_dict(new_chain_data)])
     
-    data["chains"] = chains
-    data["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if not changed:
+        print(f"ℹ️ {new_chain_data['name']}に変更はありません")
+        return
     
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if is_new:
+        print(f"✅ {new_chain_data['name']}を新規追加しました")
+    else:
+        print(f"✅ {new_chain_data['name']}の情報を更新しました")
     
+    store.export_merged(json_path)
     print(f"💾 {json_path} を保存しました")
+    index = DeltaPublisher(store).publish()
+    print(f"🧩 v{index['latest']} への差分パッチ {len(index['patches'])}件を生成")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="スターバックス メニュー自動更新")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args, "starbucks")
+    
     print("=" * 50)
     print("スターバックス メニュー自動更新")
     print("=" * 50)
     
-    starbucks_data = scrape_starbucks_menu()
-    update_chains_menu(starbucks_data)
+    last_known_good = LastKnownGoodCache()
+    breaker = CircuitBreaker()
+    sitemaps = SitemapIndex(breaker=breaker)
+    with profiler.stage("starbucks"):
+        starbucks_data = scrape_starbucks_menu(breaker, last_known_good, sitemaps)
+    if starbucks_data is None:
+        print("\n⚠️ データが取得できませんでした")
+        profiler.write_summary()
+        return
+    
+    with profiler.stage("update"):
+        update_chains_menu(starbucks_data)
+    profiler.write_summary()
     
     print("\n✨ 更新完了！")
 
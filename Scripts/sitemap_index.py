@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+sitemap.xml の lastmod による差分クロール
+- sitemap.xml（サイトマップインデックスを含む）を条件付きGETで取得・キャッシュ
+- URL → lastmod の索引を作り、前回取得成功時から lastmod が進んでいないページは取得しない
+- サイトマップが 304 なら 1 リクエストで「変更なし」と判定できる
+状態は .cache/scraper/sitemaps/<host>.json に保存する
+"""
+import gzip
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from menu_model import dumps, loads
+from menu_store import atomic_write
+from fetch_resilience import DEFAULT_CACHE_DIR, CircuitBreaker
+
+_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[float]:
+    """W3C Datetime 形式の lastmod を UNIX 時刻に変換（タイムゾーンなしは UTC とみなす）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_sitemap(raw: bytes):
+    """
+    サイトマップXMLを解析し (種類, {loc: lastmod}) を返す
+    種類は "index"（子サイトマップの一覧）か "urlset"
+    """
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    root = ET.fromstring(raw)
+    kind = "index" if root.tag.endswith("sitemapindex") else "urlset"
+    child = "sitemap" if kind == "index" else "url"
+    entries = {}
+    for element in root.iter(f"{_NS}{child}"):
+        loc = element.findtext(f"{_NS}loc")
+        if loc:
+            entries[loc.strip()] = parse_lastmod(element.findtext(f"{_NS}lastmod"))
+    return kind, entries
+
+
+class SitemapIndex:
+    """ホスト単位のサイトマップ索引と、URLごとの前回取得時点の lastmod"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache_dir: str = os.path.join(DEFAULT_CACHE_DIR, "sitemaps"),
+                 timeout: int = 10, max_depth: int = 2,
+                 get: Callable[..., requests.Response] = requests.get):
+        self.headers = headers or {"User-Agent": "CafeDokoBot/1.0 (+https://cafedoko.app/bot)"}
+        self.breaker = breaker
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_depth = max_depth
+        self.get = get
+        self._states: Dict[str, Dict] = {}
+        self._refreshed = set()
+
+    # --- 状態 ---
+
+    def _state_path(self, host: str) -> str:
+        return os.path.join(self.cache_dir, f"{host}.json")
+
+    def _state(self, host: str) -> Dict:
+        if host not in self._states:
+            try:
+                with open(self._state_path(host), "rb") as f:
+                    self._states[host] = loads(f.read())
+            except FileNotFoundError:
+                self._states[host] = {"sitemaps": {}, "crawled": {}}
+        return self._states[host]
+
+    def save(self):
+        for host, state in self._states.items():
+            atomic_write(self._state_path(host), dumps(state))
+
+    # --- 取得 ---
+
+    def _fetch(self, url: str, cached: Dict) -> Optional[bytes]:
+        """条件付きGET。未変更（304）なら None"""
+        headers = dict(self.headers)
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        def get():
+            response = self.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
+
+        response = self.breaker.call(url, get) if self.breaker else get()
+        if response.status_code == 304:
+            return None
+        cached["etag"] = response.headers.get("ETag")
+        cached["last_modified"] = response.headers.get("Last-Modified")
+        return response.content
+
+    def _refresh_sitemap(self, state: Dict, url: str, lastmod: Optional[float], depth: int):
+        sitemaps = state["sitemaps"]
+        cached = sitemaps.setdefault(url, {"urls": {}, "children": {}})
+        # インデックスに書かれた子サイトマップの lastmod が進んでいなければ取得しない
+        if lastmod is not None and cached.get("lastmod") is not None and lastmod <= cached["lastmod"]:
+            return
+        raw = self._fetch(url, cached)
+        if raw is not None:
+            kind, entries = parse_sitemap(raw)
+            previous_children = cached["children"]
+            if kind == "index":
+                cached["children"], cached["urls"] = entries, {}
+            else:
+                cached["children"], cached["urls"] = {}, entries
+            # インデックスから外れた子サイトマップの URL が lastmod の判定に残らないようにする
+            for child_url in previous_children:
+                if child_url not in cached["children"]:
+                    self._prune_sitemap(state, child_url)
+        cached["lastmod"] = lastmod
+        if depth < self.max_depth:
+            for child_url, child_lastmod in cached["children"].items():
+                self._refresh_sitemap(state, child_url, child_lastmod, depth + 1)
+
+    def _prune_sitemap(self, state: Dict, url: str):
+        removed = state["sitemaps"].pop(url, None)
+        for child_url in (removed or {}).get("children", {}):
+            self._prune_sitemap(state, child_url)
+
+    def reset_refreshed(self):
+        """常駐プロセスで次の実行時にサイトマップを取得し直せるようにする"""
+        self._refreshed.clear()
+
+    def refresh(self, sitemap_url: str):
+        """サイトマップを（1回の実行につき1度だけ）更新"""
+        if sitemap_url in self._refreshed:
+            return
+        host = urlparse(sitemap_url).hostname or sitemap_url
+        self._refresh_sitemap(self._state(host), sitemap_url, None, 0)
+        self._refreshed.add(sitemap_url)
+
+    # --- 判定 ---
+
+    def lastmod(self, url: str) -> Optional[float]:
+        state = self._state(urlparse(url).hostname or url)
+        for sitemap in state["sitemaps"].values():
+            if url in sitemap["urls"]:
+                return sitemap["urls"][url]
+        return None
+
+    def is_unchanged(self, url: str) -> bool:
+        """前回の取得成功以降に lastmod が進んでいなければ True（不明なら False）"""
+        current = self.lastmod(url)
+        if current is None:
+            return False
+        crawled = self._state(urlparse(url).hostname or url)["crawled"].get(url)
+        return crawled is not None and current <= crawled
+
+    def all_unchanged(self, urls: Iterable[str]) -> bool:
+        urls = list(urls)
+        return bool(urls) and all(self.is_unchanged(url) for url in urls)
+
+    def mark_crawled(self, urls: Iterable[str]):
+        """取得に成功したページについて、その時点の lastmod を記録"""
+        for url in urls:
+            current = self.lastmod(url)
+            if current is not None:
+                self._state(urlparse(url).hostname or url)["crawled"][url] = current
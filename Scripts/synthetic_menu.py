@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+規模検証用の合成メニュー生成
+- ChainsMenu.json と同じスキーマ（chains → categories → products → sizes）
+- チェーンごとの商品数は対数正規分布（少数の大規模チェーンと多数の小規模チェーン）
+- 商品名は実データに近い日本語（カタカナ・漢字・全角英数・商標記号の混在）
+- 店舗形態別の価格（空港・駅ナカなど）はスキーマに店舗の次元がないため、
+  "Tall（空港店）" のような追加のサイズ行として表現する
+同じ seed なら同じ内容を生成する
+
+実行方法: python3 Scripts/synthetic_menu.py --chains 1000 --products 100000 -o /tmp/SyntheticMenu.json
+"""
+import argparse
+import random
+from typing import Dict, List, Tuple
+
+from menu_model import dumps
+
+# (カテゴリー, 重み, サイズ表記, 基準価格の範囲)
+_CATEGORIES = [
+    ("ドリンク", 0.45, ["Short", "Tall", "Grande", "Venti"], (350, 650)),
+    ("フード", 0.2, ["M"], (280, 780)),
+    ("デザート", 0.12, ["M"], (300, 600)),
+    ("フラペチーノ", 0.08, ["Tall", "Grande", "Venti"], (520, 720)),
+    ("ティー", 0.08, ["S", "M", "L"], (330, 560)),
+    ("コーヒー豆", 0.04, ["250g"], (1200, 2200)),
+    ("季節限定", 0.03, ["Tall", "Grande"], (550, 750)),
+]
+_BASES = [
+    "ラテ", "カフェモカ", "カプチーノ", "アメリカーノ", "マキアート", "ブレンドコーヒー", "エスプレッソ",
+    "抹茶ラテ", "ほうじ茶ラテ", "チャイティーラテ", "ココア", "ロイヤルミルクティー", "レモネード",
+    "ミラノサンド", "クロワッサン", "ホットドッグ", "ベーグル", "パニーニ", "トースト", "スコーン",
+    "チーズケーキ", "ティラミス", "シフォンケーキ", "プリン", "マフィン", "ワッフル", "パフェ",
+]
+_MODIFIERS = [
+    "キャラメル", "ホワイト", "アイス", "ダーク", "ハニー", "ヘーゼルナッツ", "バニラ", "シナモン",
+    "ソイ", "オーツミルク", "ダブル", "クリーミー", "ほろにが", "濃厚", "黒糖", "あまおう", "和栗",
+    "ストロベリー", "チョコレート", "ピスタチオ", "メープル", "ジンジャー", "ゆず", "桜",
+]
+_SUFFIXES = ["", "", "", "", "フラペチーノ®", "TM", "（数量限定）", "ＤＸ", " スペシャル", "～季節の果実～"]
+# (店舗形態, 上乗せ額, 商品のうち店舗別価格を持つ割合)
+_STORE_TIERS = [("都心店", 20, 0.3), ("駅ナカ店", 30, 0.2), ("空港店", 60, 0.1)]
+_CHAIN_WORDS = ["珈琲", "カフェ", "コーヒー", "喫茶", "ベーカリー", "ティーハウス", "ロースターズ"]
+_PLACES = ["青山", "銀座", "神楽坂", "北浜", "栄", "天神", "札幌", "横浜", "京都", "那覇", "仙台", "金沢"]
+
+
+def chain_sizes(rng: random.Random, chains: int, products: int) -> List[int]:
+    """総数が products になるよう、対数正規分布でチェーンごとの商品数を決める（各1以上）"""
+    if chains < 1 or products < chains:
+        # 各チェーン1商品以上にすると総数が products を超え、ベンチマークの商品数と食い違う
+        raise ValueError(f"商品数（{products}）はチェーン数（{chains}）以上にしてください")
+    weights = [rng.lognormvariate(0, 1) for _ in range(chains)]
+    total = sum(weights)
+    spare = max(products - chains, 0)
+    sizes = [1 + int(spare * w / total) for w in weights]
+    # 端数を大きいチェーンから配分
+    remainder = products - sum(sizes)
+    for i in sorted(range(chains), key=lambda i: -weights[i])[:remainder]:
+        sizes[i] += 1
+    return sizes
+
+
+def _product_name(rng: random.Random, serial: int, used: set) -> str:
+    name = f"{rng.choice(_MODIFIERS)}{rng.choice(_BASES)}{rng.choice(_SUFFIXES)}"
+    if name in used:
+        name = f"{name} No.{serial}"
+    used.add(name)
+    return name
+
+
+def generate_products(rng: random.Random, count: int) -> List[Dict]:
+    """スクレイパーが返す形式（category付きの商品dictのリスト）"""
+    tiers = [t for t in _STORE_TIERS if rng.random() < 0.7]
+    used = set()
+    products = []
+    for serial in range(count):
+        category, _, size_names, (low, high) = rng.choices(_CATEGORIES, weights=[c[1] for c in _CATEGORIES])[0]
+        base = rng.randrange(low, high, 10)
+        sizes = [{"size": size, "price": base + 45 * i} for i, size in enumerate(size_names)]
+        for tier, premium, share in tiers:
+            if rng.random() < share:
+                sizes.extend({"size": f"{s['size']}（{tier}）", "price": s["price"] + premium}
+                             for s in sizes[:len(size_names)])
+        products.append({"name": _product_name(rng, serial, used), "category": category, "sizes": sizes})
+    return products
+
+
+def generate_catalog(chains: int, products: int, seed: int = 0) -> List[Tuple[str, str, List[Dict]]]:
+    """(チェーンID, チェーン名, 商品リスト) のリスト"""
+    rng = random.Random(seed)
+    catalog = []
+    for i, size in enumerate(chain_sizes(rng, chains, products)):
+        name = f"{rng.choice(_PLACES)}{rng.choice(_CHAIN_WORDS)}{i:04d}"
+        catalog.append((f"synthetic{i:04d}", name, generate_products(rng, size)))
+    return catalog
+
+
+def build_menu(catalog: List[Tuple[str, str, List[Dict]]], last_updated: str = "2025-01-01") -> Dict:
+    """ChainsMenu.json 形式に組み立てる（カテゴリーは出現順）"""
+    chains = []
+    for chain_id, chain_name, products in catalog:
+        categories: Dict[str, List[Dict]] = {}
+        for p in products:
+            categories.setdefault(p["category"], []).append(p)
+        chains.append({
+            "id": chain_id,
+            "name": chain_name,
+            "categories": [{"name": name, "products": prods} for name, prods in categories.items()],
+            "keywords": [chain_name],
+        })
+    return {"chains": chains, "last_updated": last_updated}
+
+
+def mutate_catalog(catalog: List[Tuple[str, str, List[Dict]]], chain_ratio: float = 0.01,
+                   seed: int = 1) -> List[Tuple[str, str, List[Dict]]]:
+    """
+    一部のチェーンに週次の更新相当の変更（価格改定・表記変更・商品の追加と削除）を加えた複製
+    変更しないチェーンの商品リストは元と共有する
+    """
+    rng = random.Random(seed)
+    mutated = []
+    for chain_id, chain_name, products in catalog:
+        if rng.random() >= chain_ratio:
+            mutated.append((chain_id, chain_name, products))
+            continue
+        products = [dict(p, sizes=[dict(s) for s in p["sizes"]]) for p in products]
+        for p in products:
+            roll = rng.random()
+            if roll < 0.2:
+                for s in p["sizes"]:
+                    s["price"] += 10
+            elif roll < 0.25:
+                # 表記ゆれ（全角スペース・中黒の追加）
+                p["name"] = p["name"].replace("ラテ", "・ラテ", 1) if "ラテ" in p["name"] else f"{p['name']}　"
+        if len(products) > 1 and rng.random() < 0.5:
+            products.pop(rng.randrange(len(products)))
+        products.extend(generate_products(rng, rng.randint(0, 3)))
+        # 追加した商品の名前が既存と重ならないようにする
+        seen = set()
+        for serial, p in enumerate(products):
+            if p["name"] in seen:
+                p["name"] = f"{p['name']} 新{serial}"
+            seen.add(p["name"])
+        mutated.append((chain_id, chain_name, products))
+    return mutated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="規模検証用の合成メニュー生成")
+    parser.add_argument("--chains", type=int, default=1000, help="チェーン数")
+    parser.add_argument("--products", type=int, default=100000, help="商品の総数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("-o", "--output", default="SyntheticMenu.json", help="出力先")
+    args = parser.parse_args()
+    if args.products < args.chains:
+        parser.error("--products は --chains 以上にしてください")
+
+    menu = build_menu(generate_catalog(args.chains, args.products, args.seed))
+    with open(args.output, "wb") as f:
+        f.write(dumps(menu, indent=True))
+    sizes = sum(len(p["sizes"]) for c in menu["chains"] for cat in c["categories"] for p in cat["products"])
+    print(f"💾 {args.output}: {args.chains}チェーン・{args.products}商品・{sizes}サイズ行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from import_planner import plan_chain_import
+from menu_model import Category, Chain, Product, Size
+
+
+def _chain(*products):
+    return Chain("doutor", "ドトール", [
+        Category("フード", [Product(name, "フード", [Size("M", price)]) for name, price in products]),
+    ])
+
+
+def _row(product_id, name, price, size_id=None):
+    return {"id": product_id, "name": name, "category": "フード",
+            "product_sizes": [{"id": size_id or product_id * 10, "size": "M", "price": price}]}
+
+
+def test_exact_match_is_not_taken_by_an_earlier_fuzzy_match():
+    chain = _chain(("ミラノサンドB", 450), ("ミラノサンドA", 420))
+    plan = plan_chain_import(chain, {3: _row(3, "ミラノサンドA", 420)})
+    assert plan.renames == []
+    assert plan.size_updates == []
+    assert [p.name for _, p in plan.new_products] == ["ミラノサンドB"]
+    assert plan.matched == 1
+
+
+def test_replacement_product_does_not_inherit_id():
+    plan = plan_chain_import(_chain(("ミラノサンドC", 450)), {1: _row(1, "ミラノサンドA", 420)})
+    assert plan.renames == []
+    assert [p.name for _, p in plan.new_products] == ["ミラノサンドC"]
+    assert plan.unmatched == 1
+
+
+def test_duplicate_rows_keep_lowest_id_and_delete_the_rest():
+    existing = {5: _row(5, "カフェラテ", 300), 9: _row(9, "カフェラテ", 300)}
+    plan = plan_chain_import(_chain(("カフェラテ", 300)), existing)
+    assert plan.new_products == []
+    assert plan.matched == 1
+    assert plan.product_deletes == [9]
+    assert plan.unmatched == 0
+
+
+def test_duplicates_are_not_fuzzy_matched_to_other_products():
+    existing = {5: _row(5, "カフェラテ", 300), 9: _row(9, "カフェラテ", 300)}
+    plan = plan_chain_import(_chain(("カフェラテ", 300), ("カフェラテ（数量限定）", 350)), existing)
+    assert plan.product_deletes == [9]
+    assert [p.name for _, p in plan.new_products] == ["カフェラテ（数量限定）"]
+
+
+def test_stale_products_are_deleted_only_with_prune():
+    existing = {1: _row(1, "ジャーマンドッグ", 250), 2: _row(2, "ミルクレープ", 400)}
+    chain = _chain(("ジャーマンドッグ", 260))
+
+    plan = plan_chain_import(chain, existing)
+    assert plan.product_deletes == []
+    assert plan.unmatched == 1
+    assert plan.size_updates == [(10, 260)]
+
+    plan = plan_chain_import(chain, existing, prune=True)
+    assert plan.product_deletes == [2]
+    assert plan.unmatched == 0
@@ -0,0 +1,49 @@
+from page_decoder import PageDecoder
+
+TEXT = "<html><body>ドリップコーヒーとミラノサンドはいかがですか</body></html>"
+
+
+def test_detects_japanese_encodings_without_declaration():
+    for encoding in ("cp932", "euc_jp", "utf_8"):
+        decoder = PageDecoder(state_path=None)
+        assert decoder.decode("https://example.jp/menu", TEXT.encode(encoding)) == TEXT
+        assert decoder.hosts["example.jp"] == encoding
+
+
+def test_wrong_declaration_does_not_produce_mojibake():
+    decoder = PageDecoder(state_path=None)
+    raw = TEXT.encode("utf-8")
+    assert decoder.decode("https://example.jp/menu", raw, "text/html; charset=Shift_JIS") == TEXT
+
+
+def test_cached_host_encoding_replaces_detection_without_declaration():
+    decoder = PageDecoder(state_path=None)
+    decoder.hosts["example.jp"] = "euc_jp"
+    raw = TEXT.encode("euc_jp")
+    assert decoder.candidates("example.jp", raw, None) == ["utf_8", "euc_jp"]
+    assert "euc_jp" not in decoder.candidates("example.jp", raw, "text/html; charset=utf-8")
+    assert decoder.decode("https://example.jp/menu", raw) == TEXT
+
+
+def test_declaration_beats_wrong_cached_encoding():
+    # CP932 は EUC-JP や UTF-8 のバイト列もエラーなくデコードできてしまう
+    text = "<html><body>ミラノサンド 税込 490円</body></html>"
+    raw = text.encode("euc_jp")
+    assert raw.decode("cp932") != text
+    decoder = PageDecoder(state_path=None)
+    decoder.hosts["example.jp"] = "cp932"
+    assert decoder.decode("https://example.jp/menu", raw, "text/html; charset=EUC-JP") == text
+    assert decoder.hosts["example.jp"] == "euc_jp"
+
+    decoder.hosts["example.jp"] = "cp932"
+    utf8 = "<html><body>税込</body></html>".encode("utf-8")
+    assert utf8.decode("cp932") != utf8.decode("utf-8")
+    assert decoder.decode("https://example.jp/menu", utf8, "text/html; charset=utf-8") == utf8.decode("utf-8")
+
+
+def test_cached_encoding_falls_through_when_it_fails():
+    decoder = PageDecoder(state_path=None)
+    decoder.hosts["example.jp"] = "euc_jp"
+    raw = TEXT.encode("cp932")
+    assert decoder.decode("https://example.jp/menu", raw) == TEXT
+    assert decoder.hosts["example.jp"] == "cp932"
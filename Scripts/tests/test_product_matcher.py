@@ -0,0 +1,47 @@
+from product_matcher import ProductMatcher, is_variant, normalize_name
+
+
+def test_normalize_name_folds_width_kana_and_marks():
+    assert normalize_name("ｷｬﾗﾒﾙ マキアート™") == normalize_name("キャラメル・マキアート")
+
+
+def test_alphanumeric_suffix_is_a_different_product():
+    matcher = ProductMatcher()
+    matcher.add(1, "ミラノサンドA")
+    result = matcher.match("ミラノサンドC")
+    assert result.product_id is None
+    assert not result.ambiguous
+
+
+def test_added_suffix_is_a_different_product():
+    matcher = ProductMatcher()
+    matcher.add(1, "ミラノサンド")
+    assert matcher.match("ミラノサンド2").product_id is None
+
+
+def test_variant_marker_is_a_different_product():
+    matcher = ProductMatcher()
+    matcher.add(1, "ホットカフェラテ")
+    assert matcher.match("アイスカフェラテ").product_id is None
+
+
+def test_spelling_variation_still_matches():
+    matcher = ProductMatcher()
+    matcher.add(1, "ミラノサンドＡ エビアボカド")
+    matcher.add(2, "ミラノサンドB")
+    assert matcher.match("ミラノサンドA エビ&アボカド").product_id == 1
+
+
+def test_exact_duplicates_resolve_to_lowest_id():
+    matcher = ProductMatcher()
+    matcher.add(7, "カフェラテ")
+    matcher.add(3, "カフェ・ラテ")
+    result = matcher.match("カフェラテ")
+    assert result.product_id == 3
+    assert [pid for pid, _, _ in result.candidates] == [3, 7]
+
+
+def test_is_variant():
+    assert is_variant("みらのさんどa", "みらのさんどc")
+    assert is_variant("ほっとここあ", "あいすここあ")
+    assert not is_variant("かふぇらて", "かふぇおれ")